@@ -0,0 +1,324 @@
+"""Binary game archive: games as a small header plus one 16-bit word per move.
+
+the 16-bit word is the Position move itself (position.encode_move): from square, to
+square and a 4-bit flag holding the promotion piece, captures, en passant, castling and
+double pushes. GameLogic derives it from the datatypes.Move and AvailableSpot of every
+board move with Board.to_position_move. nothing needs parsing or legality checks to read
+a game back, and a move list is a zero-copy NumPy uint16 view of the mapped file.
+
+an archive is two append-only files:
+    <path>        a MAGIC header, then the game records back to back
+    <path>.idx    one little-endian u64 offset of each record in <path>
+both are memory-mapped, so opening game n is one index read and one header unpack
+however many games the archive holds. a record is
+    RECORD header  plies (u16), result (u8), flags (u8), date (u32, yyyymmdd, 0 unknown),
+                   lengths of the white and black names (u8 each)
+    names          utf-8, white then black
+    FEN            only with the START_POSITION flag: length (u8) and ascii text
+    moves          plies little-endian u16 words
+
+usage:
+    python archive.py import games.arc games.pgn [more.pgn ...] [--jobs 4]
+    python archive.py export games.arc [game number ...]
+    python archive.py stats games.arc
+"""
+
+import argparse
+import datetime
+import mmap
+import os
+import struct
+import sys
+from collections import Counter
+from typing import Iterator
+import numpy as np
+from notation import move_to_san
+from pgn import parse_pgn, tag
+from position import Position
+
+MAGIC = b"CHESSARC\x01\x00\x00\x00"
+RECORD = struct.Struct("<HBBIBB")
+OFFSET = struct.Struct("<Q")
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2")
+# record flags
+START_POSITION = 1  # the game starts from the FEN stored after the names
+MAX_PLIES = 0xFFFF
+
+
+def _name_bytes(name: str) -> bytes:
+    """a player name as utf-8 of at most 255 bytes, cut between characters."""
+    return name.encode("utf-8")[:255].decode("utf-8", "ignore").encode("utf-8")
+
+
+class ArchivedGame:
+    def __init__(
+        self,
+        moves: np.ndarray,
+        result: str,
+        white: str,
+        black: str,
+        date: int = 0,
+        start_fen: str | None = None,
+    ):
+        """
+        Args:
+            moves (np.ndarray): uint16 Position moves; a view of the archive's mapping
+            when read from one.
+            result (str): "1-0", "0-1", "1/2-1/2" or "*".
+            white (str): white's name.
+            black (str): black's name.
+            date (int, optional): yyyymmdd, 0 if unknown.
+            start_fen (str, optional): the starting position, None for the standard one.
+        """
+        self.moves = moves
+        self.result = result
+        self.white = white
+        self.black = black
+        self.date = date
+        self.start_fen = start_fen
+
+    def start_position(self) -> Position:
+        return Position.from_fen(self.start_fen) if self.start_fen else Position.initial()
+
+    def replay(self) -> Position:
+        """the final position; the moves are trusted, not checked."""
+        position = self.start_position()
+        for move in self.moves.tolist():
+            position.make_move(move)
+        return position
+
+    def sans(self) -> list[str]:
+        position = self.start_position()
+        sans = []
+        for move in self.moves.tolist():
+            sans.append(move_to_san(position, move))
+            position.make_move(move)
+        return sans
+
+    def __repr__(self):
+        return f"ArchivedGame({self.white} - {self.black}, {len(self.moves)} plies, {self.result})"
+
+
+class ArchiveWriter:
+    def __init__(self, path: str):
+        """
+        opens an archive for appending, creating it if needed. one writer per archive at a
+        time; readers may map it meanwhile and see the games indexed when they opened it.
+        """
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._data = open(path, "ab")
+        self._index = open(path + ".idx", "ab")
+        if new:
+            self._data.write(MAGIC)
+        self._offset = self._data.tell()
+        self.count = self._index.tell() // OFFSET.size
+
+    def add(self, game: ArchivedGame) -> int:
+        """appends a game; returns its number in the archive."""
+        if len(game.moves) > MAX_PLIES:
+            raise ValueError(f"too many moves to archive: {len(game.moves)}")
+        white = _name_bytes(game.white)
+        black = _name_bytes(game.black)
+        flags = START_POSITION if game.start_fen else 0
+        parts = [
+            RECORD.pack(
+                len(game.moves), RESULTS.index(game.result), flags, game.date, len(white), len(black)
+            ),
+            white,
+            black,
+        ]
+        if game.start_fen:
+            fen = game.start_fen.encode("ascii")
+            parts += [bytes([len(fen)]), fen]
+        parts.append(np.asarray(game.moves, dtype="<u2").tobytes())
+        record = b"".join(parts)
+        self._data.write(record)
+        # the data is flushed before its offset, so an indexed game is always complete
+        self._data.flush()
+        self._index.write(OFFSET.pack(self._offset))
+        self._index.flush()
+        self._offset += len(record)
+        self.count += 1
+        return self.count - 1
+
+    def add_position(
+        self,
+        position: Position,
+        result: str,
+        white: str,
+        black: str,
+        start_fen: str | None = None,
+    ) -> int:
+        """appends the game that led to position, taken from its undo stack."""
+        moves = np.array([record[0] for record in position.undo_stack], dtype=np.uint16)
+        date = int(datetime.date.today().strftime("%Y%m%d"))
+        return self.add(ArchivedGame(moves, result, white, black, date, start_fen))
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameArchive:
+    def __init__(self, path: str):
+        """memory-maps an archive for reading."""
+        self.path = path
+        self._data_file = open(path, "rb")
+        self._index_file = open(path + ".idx", "rb")
+        self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"not a game archive: {path}")
+        index_size = os.fstat(self._index_file.fileno()).st_size
+        # mmap can't map an empty file
+        self._index_map = (
+            mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ) if index_size else None
+        )
+        self.offsets = (
+            np.frombuffer(self._index_map, dtype="<u8", count=index_size // OFFSET.size)
+            if self._index_map is not None
+            else np.zeros(0, dtype="<u8")
+        )
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, number: int) -> ArchivedGame:
+        """the game with this number, in constant time; its moves are a view of the mapping."""
+        offset = int(self.offsets[number])
+        plies, result, flags, date, white_length, black_length = RECORD.unpack_from(self._data, offset)
+        offset += RECORD.size
+        white = self._data[offset : offset + white_length].decode("utf-8")
+        offset += white_length
+        black = self._data[offset : offset + black_length].decode("utf-8")
+        offset += black_length
+        start_fen = None
+        if flags & START_POSITION:
+            fen_length = self._data[offset]
+            start_fen = self._data[offset + 1 : offset + 1 + fen_length].decode("ascii")
+            offset += 1 + fen_length
+        moves = np.frombuffer(self._data, dtype="<u2", count=plies, offset=offset)
+        return ArchivedGame(moves, RESULTS[result], white, black, date, start_fen)
+
+    def __iter__(self) -> Iterator[ArchivedGame]:
+        for number in range(len(self)):
+            yield self[number]
+
+    def close(self):
+        self.offsets = np.zeros(0, dtype="<u8")
+        for mapping in (self._index_map, self._data):
+            if mapping is None:
+                continue
+            try:
+                mapping.close()
+            except BufferError:
+                # move arrays handed out still view it; it is unmapped once they are gone
+                pass
+        self._data_file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f"GameArchive({self.path!r}, games={len(self)})"
+
+
+def import_pgn(archive_path: str, pgn_paths: list[str], jobs: int = 1) -> tuple[int, int]:
+    """
+    appends the games of PGN files to an archive; games with an illegal move are skipped.
+    jobs processes parse and check the games (see pgn.parse_pgn).
+
+    Returns:
+        tuple[int, int]: games imported and skipped.
+    """
+    imported = skipped = 0
+    with ArchiveWriter(archive_path) as writer:
+        for path in pgn_paths:
+            for game in parse_pgn(path, jobs):
+                if game.error is not None:
+                    skipped += 1
+                    continue
+                date = game.headers.get("Date", "").replace(".", "")
+                writer.add(
+                    ArchivedGame(
+                        np.frombuffer(game.position_moves, dtype=np.uint16),
+                        game.result if game.result in RESULTS else "*",
+                        game.headers.get("White", "?"),
+                        game.headers.get("Black", "?"),
+                        int(date) if date.isdigit() else 0,
+                        game.headers.get("FEN"),
+                    )
+                )
+                imported += 1
+    return imported, skipped
+
+
+def to_pgn(game: ArchivedGame) -> str:
+    date = str(game.date) if game.date else "????????"
+    lines = [
+        tag("White", game.white),
+        tag("Black", game.black),
+        tag("Date", f"{date[:4]}.{date[4:6]}.{date[6:]}"),
+        tag("Result", game.result),
+    ]
+    if game.start_fen:
+        lines += [tag("SetUp", "1"), tag("FEN", game.start_fen)]
+    start = game.start_position()
+    tokens = []
+    for ply, san in enumerate(game.sans(), start.turn):
+        if ply % 2 == 0:
+            tokens.append(f"{start.fullmove_number + ply // 2}. {san}")
+        elif not tokens:
+            tokens.append(f"{start.fullmove_number}... {san}")
+        else:
+            tokens.append(san)
+    tokens.append(game.result)
+    return "\n".join(lines) + "\n\n" + " ".join(tokens) + "\n"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="binary game archive tool")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_command = commands.add_parser("import", help="append the games of PGN files")
+    import_command.add_argument("archive")
+    import_command.add_argument("pgn", nargs="+")
+    import_command.add_argument("--jobs", type=int, default=1, help="processes parsing the PGN files")
+    export = commands.add_parser("export", help="print games as PGN")
+    export.add_argument("archive")
+    export.add_argument("games", nargs="*", type=int, help="game numbers from 0, all if none")
+    stats = commands.add_parser("stats", help="count games, moves and results")
+    stats.add_argument("archive")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        imported, skipped = import_pgn(args.archive, args.pgn, args.jobs)
+        print(f"imported {imported} games, skipped {skipped}")
+        return 0
+    with GameArchive(args.archive) as archive:
+        if args.command == "export":
+            for number in args.games or range(len(archive)):
+                print(to_pgn(archive[number]))
+            return 0
+        results = Counter()
+        plies = 0
+        for game in archive:
+            results[game.result] += 1
+            plies += len(game.moves)
+        print(f"{len(archive)} games, {plies} plies, {os.path.getsize(args.archive)} bytes")
+        for result, count in results.most_common():
+            print(f"{result:<8} {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Search benchmark: fixed-depth searches of a fixed set of positions.
+
+every position is searched to the same depth with a fresh engine and no time limit, so
+the node counts only change when the search changes. running the suite once per set of
+selective search switches shows what each technique saves.
+
+usage:
+    python bench.py [--depth 5] [--compare]
+    python bench.py --no-null-move --no-lmr --no-futility
+"""
+
+import argparse
+import sys
+import time
+from engine import Engine
+from perft import REFERENCE_POSITIONS
+from position import Position, move_to_uci
+
+# the perft positions plus a few quieter middlegames and endgames
+BENCH_POSITIONS = [(name, fen) for name, fen, _ in REFERENCE_POSITIONS] + [
+    ("italian", "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+    ("queens-gambit", "rnbqkb1r/ppp2ppp/4pn2/3p4/2PP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4"),
+    ("rook-ending", "8/5pk1/6p1/3R4/r6P/6P1/5PK1/8 w - - 0 40"),
+    ("pawn-ending", "8/5k2/3p4/1p1Pp2p/pP2Pp1P/P4P1K/8/8 b - - 0 50"),
+]
+
+# (name, Engine keyword arguments)
+CONFIGURATIONS = [
+    ("all off", dict(null_move=False, late_move_reductions=False, futility_pruning=False)),
+    ("null move", dict(null_move=True, late_move_reductions=False, futility_pruning=False)),
+    ("lmr", dict(null_move=False, late_move_reductions=True, futility_pruning=False)),
+    ("futility", dict(null_move=False, late_move_reductions=False, futility_pruning=True)),
+    ("all on", dict(null_move=True, late_move_reductions=True, futility_pruning=True)),
+]
+
+
+def run_bench(depth: int, verbose: bool = True, cutoffs: bool = False, **switches) -> tuple[int, float]:
+    """
+    searches every bench position to depth.
+
+    Args:
+        depth (int): search depth.
+        verbose (bool, optional): print a line per position. Defaults to True.
+        cutoffs (bool, optional): also print the first-move cutoff rate at each remaining
+        depth, per position and over the whole bench. Defaults to False.
+        **switches: Engine keyword arguments (null_move, late_move_reductions,
+        futility_pruning).
+
+    Returns:
+        tuple[int, float]: total nodes and seconds.
+    """
+    total_nodes = 0
+    total_seconds = 0.0
+    # beta cutoffs and first-move cutoffs by remaining depth over every position
+    all_cutoffs = [0] * (depth + 1)
+    all_first = [0] * (depth + 1)
+    for name, fen in BENCH_POSITIONS:
+        engine = Engine(depth, None, **switches)
+        result = engine.search(Position.from_fen(fen))
+        total_nodes += result.nodes
+        total_seconds += result.seconds
+        for remaining in range(depth + 1):
+            all_cutoffs[remaining] += engine.cutoffs[remaining]
+            all_first[remaining] += engine.first_move_cutoffs[remaining]
+        if verbose:
+            best = move_to_uci(result.move) if result.move is not None else "-"
+            print(
+                f"{name:<20} {best:<6} {result.score:>7} {result.nodes:>9} nodes "
+                f"{result.seconds:8.2f}s"
+            )
+            if cutoffs:
+                print(f"    first-move cutoffs {engine.cutoff_rates()}")
+    if verbose:
+        print(f"total: {total_nodes} nodes in {total_seconds:.2f}s, {total_nodes / max(total_seconds, 1e-9):.0f} nps")
+        if cutoffs:
+            rates = " ".join(
+                f"d{remaining} {all_first[remaining] / all_cutoffs[remaining]:.1%} ({all_cutoffs[remaining]})"
+                for remaining in range(depth + 1)
+                if all_cutoffs[remaining]
+            )
+            print(f"first-move cutoffs by remaining depth: {rates}")
+    return total_nodes, total_seconds
+
+
+def compare(depth: int):
+    """runs the bench once per configuration and prints the node savings of each."""
+    baseline = None
+    for name, switches in CONFIGURATIONS:
+        nodes, seconds = run_bench(depth, verbose=False, **switches)
+        baseline = baseline or nodes
+        print(
+            f"{name:<10} {nodes:>10} nodes {seconds:8.2f}s  "
+            f"{1 - nodes / baseline:6.1%} fewer nodes than all off"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="fixed-depth search benchmark")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument(
+        "--compare", action="store_true", help="run every selective search configuration"
+    )
+    parser.add_argument("--no-null-move", action="store_true")
+    parser.add_argument("--no-lmr", action="store_true")
+    parser.add_argument("--no-futility", action="store_true")
+    parser.add_argument(
+        "--cutoffs", action="store_true", help="print first-move cutoff rates by remaining depth"
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(args.depth)
+        return 0
+    start = time.perf_counter()
+    run_bench(
+        args.depth,
+        cutoffs=args.cutoffs,
+        null_move=not args.no_null_move,
+        late_move_reductions=not args.no_lmr,
+        futility_pruning=not args.no_futility,
+    )
+    print(f"wall time: {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
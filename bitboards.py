@@ -0,0 +1,171 @@
+"""64-bit integer bitboards and precomputed attack tables.
+
+bit n of a bitboard is square n of position.Position (a1=0 ... h8=63).
+sliding attacks are looked up in per-square tables keyed by the relevant blockers
+(`occupied & mask`), the same idea as magic bitboards with a dict as the perfect hash.
+"""
+
+from position import WHITE
+
+FULL = (1 << 64) - 1
+
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_2 = RANK_1 << 8
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_7 = RANK_1 << 48
+RANK_8 = RANK_1 << 56
+
+SQUARES = [1 << square for square in range(64)]
+
+KNIGHT_OFFSETS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_OFFSETS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def lsb(bitboard: int) -> int:
+    """index of the least significant set bit."""
+    return (bitboard & -bitboard).bit_length() - 1
+
+
+def msb(bitboard: int) -> int:
+    """index of the most significant set bit."""
+    return bitboard.bit_length() - 1
+
+
+def iter_squares(bitboard: int):
+    """yields the squares of the set bits, lowest first."""
+    while bitboard:
+        bit = bitboard & -bitboard
+        yield bit.bit_length() - 1
+        bitboard ^= bit
+
+
+def popcount(bitboard: int) -> int:
+    return bitboard.bit_count()
+
+
+def _step_attacks(offsets) -> list[int]:
+    table = []
+    for square in range(64):
+        file, rank = square & 7, square >> 3
+        attacks = 0
+        for df, dr in offsets:
+            f, r = file + df, rank + dr
+            if 0 <= f < 8 and 0 <= r < 8:
+                attacks |= 1 << (r * 8 + f)
+        table.append(attacks)
+    return table
+
+
+def _ray_attacks(square: int, occupied: int, directions) -> int:
+    """walks the rays one step at a time; only used to fill the tables."""
+    file, rank = square & 7, square >> 3
+    attacks = 0
+    for df, dr in directions:
+        f, r = file + df, rank + dr
+        while 0 <= f < 8 and 0 <= r < 8:
+            bit = 1 << (r * 8 + f)
+            attacks |= bit
+            if occupied & bit:
+                break
+            f += df
+            r += dr
+    return attacks
+
+
+def _relevant_mask(square: int, directions) -> int:
+    """squares whose occupancy can block a slider; the edge square of each ray never matters."""
+    file, rank = square & 7, square >> 3
+    mask = 0
+    for df, dr in directions:
+        f, r = file + df, rank + dr
+        while 0 <= f + df < 8 and 0 <= r + dr < 8:
+            mask |= 1 << (r * 8 + f)
+            f += df
+            r += dr
+    return mask
+
+
+def _slider_tables(directions) -> tuple[list[int], list[dict[int, int]]]:
+    masks = []
+    tables = []
+    for square in range(64):
+        mask = _relevant_mask(square, directions)
+        table = {}
+        # enumerate every subset of the mask (carry-rippler trick)
+        subset = 0
+        while True:
+            table[subset] = _ray_attacks(square, subset, directions)
+            subset = (subset - mask) & mask
+            if subset == 0:
+                break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+KNIGHT_ATTACKS = _step_attacks(KNIGHT_OFFSETS)
+KING_ATTACKS = _step_attacks(KING_OFFSETS)
+PAWN_ATTACKS = (
+    _step_attacks(((-1, 1), (1, 1))),  # white pawns capture upwards
+    _step_attacks(((-1, -1), (1, -1))),
+)
+ROOK_MASKS, ROOK_TABLES = _slider_tables(ROOK_DIRECTIONS)
+BISHOP_MASKS, BISHOP_TABLES = _slider_tables(BISHOP_DIRECTIONS)
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+
+
+def queen_attacks(square: int, occupied: int) -> int:
+    return (
+        ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+        | BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+    )
+
+
+def pawn_pushes(pawns: int, empty: int, color: int) -> tuple[int, int]:
+    """returns (single pushes, double pushes) target bitboards."""
+    if color == WHITE:
+        single = (pawns << 8) & empty
+        return single, ((single & RANK_3) << 8) & empty
+    single = (pawns >> 8) & empty
+    return single, ((single & RANK_6) >> 8) & empty
+
+
+def pawn_attacks_bb(pawns: int, color: int) -> int:
+    """all squares attacked by a set of pawns."""
+    if color == WHITE:
+        return (((pawns & ~FILE_A) << 7) | ((pawns & ~FILE_H) << 9)) & FULL
+    return ((pawns & ~FILE_A) >> 9) | ((pawns & ~FILE_H) >> 7)
+
+
+def _line_tables() -> tuple[list[list[int]], list[list[int]]]:
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for a in range(64):
+        for b in range(64):
+            if a == b:
+                continue
+            for tables, masks in ((ROOK_TABLES, ROOK_MASKS), (BISHOP_TABLES, BISHOP_MASKS)):
+                if not tables[a][0] & (1 << b):
+                    continue
+                between[a][b] = (
+                    tables[a][(1 << b) & masks[a]] & tables[b][(1 << a) & masks[b]]
+                )
+                line[a][b] = (tables[a][0] & tables[b][0]) | (1 << a) | (1 << b)
+    return between, line
+
+
+# BETWEEN[a][b]: squares strictly between two aligned squares (0 if not aligned).
+# LINE[a][b]: the whole rank, file or diagonal through two aligned squares (0 if not aligned).
+BETWEEN, LINE = _line_tables()
@@ -0,0 +1,228 @@
+"""Opening book in the Polyglot .bin format.
+
+a book is a sorted array of 16-byte big-endian entries:
+    key (u64)     Position.key, which uses the Polyglot Zobrist keys (see zobrist.py)
+    move (u16)    to file | to rank << 3 | from file << 6 | from rank << 9 | promotion << 12,
+                  promotion 1..4 = knight..queen; castling is written as the king taking
+                  its own rook (e1h1, e1a1, e8h8, e8a8)
+    weight (u16)  how often the move should be chosen relative to its siblings
+    learn (u32)   unused, 0
+the file is memory-mapped, not read: a lookup is a binary search over the entries for
+the first one with the key, touching a handful of pages, so books of any size open
+instantly.
+
+usage:
+    python book.py build book.bin games.pgn [more.pgn ...] [--max-ply 20] [--min-games 2] [--jobs 4]
+    python book.py probe book.bin [fen]
+"""
+
+import argparse
+import mmap
+import random
+import struct
+import sys
+from collections import defaultdict
+from movegen import generate_legal_moves
+from notation import parse_san
+from pgn import parse_pgn
+from position import (
+    Position,
+    WHITE,
+    KING_CASTLE,
+    QUEEN_CASTLE,
+    KNIGHT,
+    is_promotion,
+    promotion_piece,
+    move_to_uci,
+)
+
+ENTRY = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+# king destination of a castling move -> the rook square Polyglot writes instead
+CASTLING_ROOK = {6: 7, 2: 0, 62: 63, 58: 56}
+# book weights are u16; the counts of a position's moves are scaled down to fit
+MAX_WEIGHT = 0xFFFF
+
+
+def move_to_polyglot(move: int) -> int:
+    """the Polyglot encoding of a Position move."""
+    from_square = move & 63
+    to_square = (move >> 6) & 63
+    if move >> 12 in (KING_CASTLE, QUEEN_CASTLE):
+        to_square = CASTLING_ROOK[to_square]
+    # squares are rank * 8 + file in both encodings
+    polyglot = to_square | from_square << 6
+    if is_promotion(move):
+        polyglot |= (promotion_piece(move) - KNIGHT + 1) << 12
+    return polyglot
+
+
+def polyglot_to_move(position: Position, polyglot: int) -> int | None:
+    """the legal move of position a Polyglot move stands for, None if there is none."""
+    for move in generate_legal_moves(position, sources=1 << ((polyglot >> 6) & 63)):
+        if move_to_polyglot(move) == polyglot:
+            return move
+    return None
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        """
+        memory-maps a Polyglot book.
+
+        Args:
+            path (str): the .bin file.
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        size = self._file.seek(0, 2)
+        self.entry_count = size // ENTRY.size
+        # mmap can't map an empty file
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __len__(self):
+        return self.entry_count
+
+    def _key_at(self, index: int) -> int:
+        return KEY.unpack_from(self._map, index * ENTRY.size)[0]
+
+    def _lower_bound(self, key: int) -> int:
+        """index of the first entry whose key is not below key."""
+        low, high = 0, self.entry_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, key: int) -> list[tuple[int, int]]:
+        """the (Polyglot move, weight) entries of a position key."""
+        entries = []
+        index = self._lower_bound(key)
+        while index < self.entry_count:
+            entry_key, move, weight, _ = ENTRY.unpack_from(self._map, index * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((move, weight))
+            index += 1
+        return entries
+
+    def moves(self, position: Position) -> list[tuple[int, int]]:
+        """the legal (move, weight) book moves of position."""
+        moves = []
+        for polyglot, weight in self.entries(position.key):
+            move = polyglot_to_move(position, polyglot)
+            if move is not None:
+                moves.append((move, weight))
+        return moves
+
+    def pick(self, position: Position, rng: random.Random | None = None) -> int | None:
+        """
+        a book move for position chosen at random in proportion to the weights, None when
+        the position is not in the book.
+        """
+        moves = [(move, weight) for move, weight in self.moves(position) if weight > 0]
+        if not moves:
+            return None
+        rng = rng or random
+        return rng.choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f"OpeningBook({self.path!r}, entries={self.entry_count})"
+
+
+def build_book(
+    pgn_paths: list[str],
+    book_path: str,
+    max_ply: int = 20,
+    min_games: int = 1,
+    jobs: int = 1,
+) -> int:
+    """
+    writes a Polyglot book of the first max_ply moves of the games in the PGN files.
+    a move gets 2 points for each game it was played in and won, 1 for each draw; moves
+    seen in fewer than min_games games are left out. games stop counting at their first
+    illegal move. jobs processes parse the files (see pgn.parse_pgn).
+
+    Returns:
+        int: the number of entries written.
+    """
+    # (key, polyglot move) -> [games, points]
+    stats: dict[tuple[int, int], list[int]] = defaultdict(lambda: [0, 0])
+    for path in pgn_paths:
+        for game in parse_pgn(path, jobs, validate=False):
+            points = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}.get(game.result, (0, 0))
+            try:
+                position = game.start_position()
+            except ValueError:
+                continue
+            for san in game.moves[:max_ply]:
+                try:
+                    move = parse_san(position, san)
+                except ValueError:
+                    break
+                entry = stats[(position.key, move_to_polyglot(move))]
+                entry[0] += 1
+                entry[1] += points[0] if position.turn == WHITE else points[1]
+                position.make_move(move)
+
+    by_key: dict[int, list[tuple[int, int]]] = defaultdict(list)
+    for (key, move), (games, points) in stats.items():
+        if games >= min_games and points > 0:
+            by_key[key].append((move, points))
+
+    count = 0
+    with open(book_path, "wb") as book:
+        for key in sorted(by_key):
+            moves = sorted(by_key[key], key=lambda entry: entry[1], reverse=True)
+            scale = max(1, -(-moves[0][1] // MAX_WEIGHT))
+            for move, points in moves:
+                book.write(ENTRY.pack(key, move, max(1, points // scale), 0))
+                count += 1
+    return count
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Polyglot opening book tool")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a book from PGN files")
+    build.add_argument("book")
+    build.add_argument("pgn", nargs="+")
+    build.add_argument("--max-ply", type=int, default=20)
+    build.add_argument("--min-games", type=int, default=1)
+    build.add_argument("--jobs", type=int, default=1, help="processes parsing the PGN files")
+    probe = commands.add_parser("probe", help="list the book moves of a position")
+    probe.add_argument("book")
+    probe.add_argument("fen", nargs="?")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build_book(args.pgn, args.book, args.max_ply, args.min_games, args.jobs)
+        print(f"wrote {count} entries to {args.book}")
+        return 0
+    position = Position.from_fen(args.fen) if args.fen else Position.initial()
+    with OpeningBook(args.book) as book:
+        moves = book.moves(position)
+        total = sum(weight for _, weight in moves) or 1
+        for move, weight in sorted(moves, key=lambda entry: entry[1], reverse=True):
+            print(f"{move_to_uci(move):<6} {weight:>6} {weight / total:6.1%}")
+        if not moves:
+            print("not in book")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
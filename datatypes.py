@@ -24,6 +24,7 @@ class AvailableSpot:
         is_castling=False,
         is_promotion=False,
         target_cell: "game_elements.Cell" = None,
+        promotion_piece: str = "queen",
     ):
         """
         Args:
@@ -32,6 +33,7 @@ class AvailableSpot:
             target_cell (game_elements.Cell, optional): the piece that the special move is gonna be made on. Defaults to None.
             is_castling (bool, optional): if moving to this spot is castling. Defaults to False.
             is_promotion (bool, optional): if moving to this spot is promotion. Defaults to False.
+            promotion_piece (str, optional): the piece a pawn promotes to. Defaults to "queen".
 
         Raises:
             ValueError: You must pass the target_cell parameter if you pass is_en_passant or is_castling as True
@@ -41,6 +43,7 @@ class AvailableSpot:
         self.is_castling = is_castling
         self.is_promotion = is_promotion
         self.target_cell = target_cell
+        self.promotion_piece = promotion_piece
         self.castling_details: dict[str, tuple[int, int]] = {}
         if self.is_en_passant or self.is_castling:
             if self.target_cell is None:
@@ -0,0 +1,500 @@
+"""Search engine behind input_sources.Bot.
+
+negamax alpha-beta over position.Position with iterative deepening: depth 1, 2, 3... is
+searched until the depth limit or the time budget is reached, and the best move of the
+last completed iteration is played.
+"""
+
+import logging
+from typing import Callable
+from evaluation import evaluate, static_exchange, SEE_VALUES
+from movegen import generate_legal_moves, in_check, NOISY_MOVES
+from move_ordering import MoveOrderer, mvv_lva
+from pawns import PawnHashTable
+from position import (
+    Position,
+    WHITE,
+    BLACK,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    CAPTURE,
+    PROMOTION,
+    EN_PASSANT,
+    move_to_uci,
+)
+from tablebase import Tablebases
+from time_manager import TimeManager, NS_PER_SECOND
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+INFINITY = 1_000_000
+MATE_SCORE = 100_000
+# scores beyond this are mates, MATE_SCORE - score being the distance in plies
+MATE_BOUND = MATE_SCORE - 1_000
+MAX_PLY = 128
+
+# selective search
+NULL_MOVE_MIN_DEPTH = 3
+# the null move is searched this much shallower (plus one more from depth 7 on)
+NULL_MOVE_REDUCTION = 2
+LMR_MIN_DEPTH = 3
+# moves before this index (the hash move and captures, mostly) are never reduced
+LMR_MIN_INDEX = 3
+# quiet moves at depth 1 and 2 are pruned when the static evaluation plus this margin
+# can't reach alpha
+FUTILITY_MARGINS = (0, 200, 400)
+
+
+class SearchAborted(Exception):
+    """raised inside the search when the time budget runs out or it is stopped."""
+
+
+class SearchResult:
+    def __init__(
+        self,
+        move: int | None,
+        score: int,
+        depth: int,
+        nodes: int,
+        seconds: float,
+        pv: list[int],
+    ):
+        """
+        Args:
+            move (int | None): the best move (position.encode_move), None if there is no legal move.
+            score (int): centipawns from the side to move's point of view.
+            depth (int): the deepest completed iteration.
+            nodes (int): nodes searched.
+            seconds (float): time spent.
+            pv (list[int]): the principal variation, starting with move.
+        """
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.seconds = seconds
+        self.pv = pv
+
+    def __str__(self):
+        pv = " ".join(move_to_uci(move) for move in self.pv)
+        return (
+            f"SearchResult(depth={self.depth}, score={self.score}, nodes={self.nodes}, "
+            f"seconds={self.seconds:.2f}, pv={pv})"
+        )
+
+
+def has_pieces(position: Position, color: int) -> bool:
+    """whether a color has anything besides pawns and its king."""
+    sign = 1 if color == WHITE else -1
+    bitboards = position.bitboards
+    return bool(
+        bitboards[KNIGHT * sign]
+        | bitboards[BISHOP * sign]
+        | bitboards[ROOK * sign]
+        | bitboards[QUEEN * sign]
+    )
+
+
+def score_to_table(score: int, ply: int) -> int:
+    """mate scores are stored relative to the position, not to the root."""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def tablebase_score(value: int, ply: int) -> int:
+    """a tablebase value (mate distance in plies, see tablebase.py) as a mate score at ply."""
+    if value > 0:
+        return MATE_SCORE - ply - (value - 1)
+    if value < 0:
+        return -(MATE_SCORE - ply - (-value - 1))
+    return 0
+
+
+class Engine:
+    def __init__(
+        self,
+        max_depth: int = 6,
+        time_limit: float | None = 1.0,
+        table: TranspositionTable | None = None,
+        null_move: bool = True,
+        late_move_reductions: bool = True,
+        futility_pruning: bool = True,
+        tablebases: Tablebases | None = None,
+        pawn_table: PawnHashTable | None = None,
+    ):
+        """
+        Args:
+            max_depth (int, optional): deepest iteration to search. Defaults to 6.
+            time_limit (float | None, optional): seconds per search, None for no limit.
+            Defaults to 1.0.
+            table (TranspositionTable, optional): kept between searches; a 16 MB table is
+            created if it's None.
+            null_move (bool, optional): null-move pruning. Defaults to True.
+            late_move_reductions (bool, optional): search late quiet moves shallower.
+            Defaults to True.
+            futility_pruning (bool, optional): skip quiet moves near the horizon that can't
+            raise alpha. Defaults to True.
+            tablebases (Tablebases, optional): endgames played and scored from the tables
+            instead of searched.
+            pawn_table (PawnHashTable, optional): kept between searches; a default sized
+            one is created if it's None.
+        """
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.table = table if table is not None else TranspositionTable()
+        self.pawn_table = pawn_table if pawn_table is not None else PawnHashTable()
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.futility_pruning = futility_pruning
+        self.tablebases = tablebases if tablebases else None
+        self.tablebase_hits = 0
+        self.nodes = 0
+        # the part of self.nodes spent in the quiescence search
+        self.quiescence_nodes = 0
+        # how often each selective search technique kicked in during the last search
+        self.null_move_cutoffs = 0
+        self.reductions = 0
+        self.futility_prunes = 0
+        self._time_manager = TimeManager()
+        self._check_interval = self._time_manager.check_interval
+        self._should_stop: Callable[[], bool] | None = None
+        self.ordering = MoveOrderer(MAX_PLY)
+        # beta cutoffs in the last search by remaining depth, and how many of them came
+        # from the first move searched; a well ordered search has almost only the latter
+        self.cutoffs = [0] * (MAX_PLY + 1)
+        self.first_move_cutoffs = [0] * (MAX_PLY + 1)
+        # principal variation found below each ply in the current iteration
+        self._pv: list[list[int]] = [[] for _ in range(MAX_PLY + 1)]
+
+    def search(
+        self,
+        position: Position,
+        max_depth: int | None = None,
+        time_limit: float | None = None,
+        should_stop: Callable[[], bool] | None = None,
+        depth_offset: int = 0,
+        time_manager: TimeManager | None = None,
+    ) -> SearchResult:
+        """
+        searches the position with iterative deepening. the position is left unchanged.
+
+        Args:
+            position (Position): the position to search, for its side to move.
+            max_depth (int, optional): overrides self.max_depth.
+            time_limit (float, optional): overrides self.time_limit.
+            should_stop (Callable[[], bool], optional): polled along with the clock; the
+            search ends early, with the last completed iteration, once it returns True.
+            depth_offset (int, optional): iteration n searches to depth n + depth_offset
+            (capped at max_depth); lazy SMP helpers use it to stay out of each other's way.
+            time_manager (TimeManager, optional): soft and hard limits for this search, a
+            game clock's budget for example; replaces time_limit.
+
+        Returns:
+            SearchResult: the result of the deepest completed iteration.
+        """
+        max_depth = max_depth if max_depth is not None else self.max_depth
+        if time_manager is None:
+            time_manager = TimeManager.fixed(
+                time_limit if time_limit is not None else self.time_limit
+            )
+        time_manager.start()
+        self._time_manager = time_manager
+        self._check_interval = time_manager.check_interval
+        self._should_stop = should_stop
+        self.nodes = 0
+        self.quiescence_nodes = 0
+        self.null_move_cutoffs = 0
+        self.reductions = 0
+        self.futility_prunes = 0
+        self.tablebase_hits = 0
+        self.table.new_search()
+        self.table.reset_stats()
+        self.pawn_table.reset_stats()
+        self.ordering.new_search()
+        self.cutoffs = [0] * (MAX_PLY + 1)
+        self.first_move_cutoffs = [0] * (MAX_PLY + 1)
+
+        root_moves = generate_legal_moves(position)
+        if not root_moves:
+            score = -MATE_SCORE if in_check(position) else 0
+            return SearchResult(None, score, 0, 0, 0.0, [])
+        if self.tablebases is not None:
+            # a perfect move, no search needed
+            best = self.tablebases.best_move(position)
+            if best is not None:
+                move, value = best
+                self.tablebase_hits += 1
+                seconds = time_manager.elapsed_ns() / NS_PER_SECOND
+                return SearchResult(move, tablebase_score(value, 0), 0, 0, seconds, [move])
+        result = SearchResult(root_moves[0], 0, 0, 0, 0.0, [root_moves[0]])
+
+        for iteration in range(1, max_depth + 1):
+            depth = min(iteration + depth_offset, max_depth)
+            try:
+                score = self._search_root(position, root_moves, depth)
+            except SearchAborted:
+                break
+            pv = self._pv[0].copy()
+            seconds = time_manager.elapsed_ns() / NS_PER_SECOND
+            result = SearchResult(pv[0], score, depth, self.nodes, seconds, pv)
+            logging.debug(str(result))
+            # the best move is searched first in the next iteration
+            root_moves.remove(pv[0])
+            root_moves.insert(0, pv[0])
+            if abs(score) >= MATE_BOUND or depth == max_depth:
+                break
+            # the next iteration would take several times as long as this one
+            if time_manager.soft_expired():
+                break
+
+        result.nodes = self.nodes
+        result.seconds = time_manager.elapsed_ns() / NS_PER_SECOND
+        return result
+
+    def first_move_cutoff_rate(self, depth: int | None = None) -> float:
+        """
+        share of the last search's beta cutoffs produced by the first move searched.
+
+        Args:
+            depth (int, optional): only count nodes with this remaining depth; all if None.
+        """
+        if depth is None:
+            cutoffs, first = sum(self.cutoffs), sum(self.first_move_cutoffs)
+        else:
+            cutoffs, first = self.cutoffs[depth], self.first_move_cutoffs[depth]
+        return first / cutoffs if cutoffs else 0.0
+
+    def cutoff_rates(self) -> str:
+        """the first-move cutoff rate overall, then per remaining depth, on one line."""
+        depths = " ".join(
+            f"d{depth} {self.first_move_cutoff_rate(depth):.0%}"
+            for depth in range(len(self.cutoffs))
+            if self.cutoffs[depth]
+        )
+        return f"{self.first_move_cutoff_rate():.1%} ({depths})"
+
+    def cutoff_stats(self) -> str:
+        """one line per remaining depth: cutoffs and first-move cutoff rate."""
+        return "\n".join(
+            f"depth {depth}: {self.cutoffs[depth]} cutoffs, "
+            f"{self.first_move_cutoff_rate(depth):.1%} on the first move"
+            for depth in range(len(self.cutoffs))
+            if self.cutoffs[depth]
+        )
+
+    def _check_time(self):
+        if self._time_manager.hard_expired():
+            raise SearchAborted()
+        if self._should_stop is not None and self._should_stop():
+            raise SearchAborted()
+
+    def _search_root(self, position: Position, moves: list[int], depth: int) -> int:
+        alpha = -INFINITY
+        beta = INFINITY
+        for move in moves:
+            position.make_move(move)
+            try:
+                score = -self._negamax(position, depth - 1, -beta, -alpha, 1)
+            finally:
+                position.unmake_move()
+            if score > alpha:
+                alpha = score
+                self._pv[0] = [move] + self._pv[1]
+        self.table.store(position.key, self._pv[0][0], alpha, depth, EXACT)
+        return alpha
+
+    def _negamax(
+        self,
+        position: Position,
+        depth: int,
+        alpha: int,
+        beta: int,
+        ply: int,
+        allow_null: bool = True,
+    ) -> int:
+        self.nodes += 1
+        if self.nodes % self._check_interval == 0:
+            self._check_time()
+        self._pv[ply] = []
+
+        if position.halfmove_clock >= 100 or position.repetition_count():
+            return 0
+        if (
+            self.tablebases is not None
+            and (position.occupied_co[WHITE] | position.occupied_co[BLACK]).bit_count() == 3
+        ):
+            value = self.tablebases.probe(position)
+            if value is not None:
+                self.tablebase_hits += 1
+                return tablebase_score(value, ply)
+        if depth <= 0 or ply >= MAX_PLY:
+            self.nodes -= 1
+            return self._quiescence(position, alpha, beta, ply)
+
+        key = position.key
+        entry = self.table.probe(key)
+        table_move = 0
+        if entry is not None:
+            table_move, score, entry_depth, bound = entry
+            if entry_depth >= depth:
+                score = score_from_table(score, ply)
+                if (
+                    bound == EXACT
+                    or (bound == LOWER and score >= beta)
+                    or (bound == UPPER and score <= alpha)
+                ):
+                    return score
+
+        checked = in_check(position)
+        static_eval = None if checked else evaluate(position, self.pawn_table)
+
+        # null move: if passing still fails high in a reduced search, a real move would
+        # too. not in pawn endings, where passing can be better than any move (zugzwang)
+        if (
+            self.null_move
+            and allow_null
+            and not checked
+            and depth >= NULL_MOVE_MIN_DEPTH
+            and static_eval >= beta
+            and abs(beta) < MATE_BOUND
+            and has_pieces(position, position.turn)
+        ):
+            reduction = NULL_MOVE_REDUCTION + (depth >= 7)
+            position.make_null_move()
+            try:
+                score = -self._negamax(
+                    position, depth - 1 - reduction, -beta, -beta + 1, ply + 1, False
+                )
+            finally:
+                position.unmake_null_move()
+            if score >= beta:
+                self.null_move_cutoffs += 1
+                return beta
+
+        futile = (
+            self.futility_pruning
+            and not checked
+            and depth < len(FUTILITY_MARGINS)
+            and static_eval + FUTILITY_MARGINS[depth] <= alpha
+            and abs(alpha) < MATE_BOUND
+        )
+        killers = self.ordering.killers[ply]
+
+        original_alpha = alpha
+        best_move = 0
+        index = -1
+        for index, move in enumerate(self.ordering.pick(position, table_move, ply)):
+            quiet = not move >> 12 & (CAPTURE | PROMOTION)
+            position.make_move(move)
+            gives_check = quiet and in_check(position)
+            if futile and quiet and index > 0 and not gives_check:
+                position.unmake_move()
+                self.futility_prunes += 1
+                continue
+            try:
+                if (
+                    self.late_move_reductions
+                    and quiet
+                    and depth >= LMR_MIN_DEPTH
+                    and index >= LMR_MIN_INDEX
+                    and not checked
+                    and not gives_check
+                    and move != killers[0]
+                    and move != killers[1]
+                ):
+                    # late moves are unlikely to be good: a reduced null window search
+                    # first, the full search only if the move beats alpha after all
+                    reduction = 1 if index < 6 or depth < 5 else 2
+                    self.reductions += 1
+                    score = -self._negamax(
+                        position, depth - 1 - reduction, -alpha - 1, -alpha, ply + 1
+                    )
+                    if score > alpha:
+                        score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+                else:
+                    score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                position.unmake_move()
+            if score >= beta:
+                self.ordering.update(position, move, depth, ply)
+                self.cutoffs[depth] += 1
+                if index == 0:
+                    self.first_move_cutoffs[depth] += 1
+                self.table.store(key, move, score_to_table(score, ply), depth, LOWER)
+                return score
+            if score > alpha:
+                alpha = score
+                best_move = move
+                self._pv[ply] = [move] + self._pv[ply + 1]
+        if index < 0:
+            return -MATE_SCORE + ply if checked else 0
+        bound = EXACT if alpha > original_alpha else UPPER
+        self.table.store(key, best_move, score_to_table(alpha, ply), depth, bound)
+        return alpha
+
+    def _quiescence(self, position: Position, alpha: int, beta: int, ply: int) -> int:
+        """
+        searches captures and promotions only, until the position is quiet, so the
+        static evaluation is never taken in the middle of an exchange. the side to move
+        may stand pat on the static evaluation instead of capturing, and captures that
+        lose material by static exchange evaluation are skipped. in check every evasion
+        is searched.
+        """
+        self.nodes += 1
+        self.quiescence_nodes += 1
+        if self.nodes % self._check_interval == 0:
+            self._check_time()
+        self._pv[ply] = []
+        if ply >= MAX_PLY:
+            return evaluate(position, self.pawn_table)
+
+        checked = in_check(position)
+        if checked:
+            moves = generate_legal_moves(position)
+            if not moves:
+                return -MATE_SCORE + ply
+        else:
+            stand_pat = evaluate(position, self.pawn_table)
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            moves = generate_legal_moves(position, kinds=NOISY_MOVES)
+        moves.sort(key=lambda move: mvv_lva(position, move), reverse=True)
+
+        squares = position.squares
+        for move in moves:
+            flag = move >> 12
+            if not checked and flag & CAPTURE and not flag & PROMOTION:
+                # winning a piece at least as valuable as the capturer can't lose material
+                victim = PAWN if flag == EN_PASSANT else abs(squares[(move >> 6) & 63])
+                attacker = abs(squares[move & 63])
+                if (
+                    SEE_VALUES[victim] < SEE_VALUES[attacker]
+                    and static_exchange(position, move) < 0
+                ):
+                    continue
+            position.make_move(move)
+            try:
+                score = -self._quiescence(position, -beta, -alpha, ply + 1)
+            finally:
+                position.unmake_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+                self._pv[ply] = [move] + self._pv[ply + 1]
+        return alpha
@@ -0,0 +1,194 @@
+"""Static evaluation of a position.Position: material plus midgame and endgame
+piece-square tables (psqt.py) tapered by the game phase, and static exchange evaluation
+of captures.
+
+scores are in centipawns; evaluate() returns them from the side to move's point of view.
+"""
+
+import numpy as np
+from bitboards import ROOK_MASKS, ROOK_TABLES, BISHOP_MASKS, BISHOP_TABLES
+from movegen import attackers_to
+from pawns import PawnHashTable, pawn_structure
+from psqt import MG_VALUES, EG_VALUES, PHASE, MAX_PHASE
+from position import (
+    Position,
+    WHITE,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    CAPTURE,
+    EN_PASSANT,
+    PROMOTION,
+)
+
+PLANE_PIECES = (1, 2, 3, 4, 5, 6, -1, -2, -3, -4, -5, -6)
+# the tables as one (12 * 64, 3) matrix matching flattened position_planes(): columns are
+# the midgame value, endgame value and phase weight of a piece on a square. float32 keeps
+# the sums exact (they stay far below 2**24) and lets the product use BLAS.
+PLANE_WEIGHTS = np.array(
+    [
+        (MG_VALUES[piece][square], EG_VALUES[piece][square], PHASE[piece])
+        for piece in PLANE_PIECES
+        for square in range(64)
+    ],
+    dtype=np.float32,
+)
+
+
+def taper(mg_score: int, eg_score: int, phase: int) -> int:
+    """blends the midgame and endgame scores by how much material is left."""
+    phase = min(phase, MAX_PHASE)
+    return (mg_score * phase + eg_score * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+def evaluate(position: Position, pawn_table: PawnHashTable | None = None) -> int:
+    """
+    material, piece-square and pawn structure score of the position, from the side to
+    move's point of view. material and piece-square terms come from the accumulators
+    Position keeps up to date, so they cost the same for every position.
+
+    Args:
+        position (Position): the position to score.
+        pawn_table (PawnHashTable, optional): cache for the pawn structure; it's computed
+        every time if None.
+    """
+    white_pawns = position.bitboards[PAWN]
+    black_pawns = position.bitboards[-PAWN]
+    if pawn_table is not None:
+        pawn_mg, pawn_eg, _, _ = pawn_table.get(position.pawn_key, white_pawns, black_pawns)
+    else:
+        pawn_mg, pawn_eg, _, _ = pawn_structure(white_pawns, black_pawns)
+    score = taper(position.mg_score + pawn_mg, position.eg_score + pawn_eg, position.phase)
+    return score if position.turn == WHITE else -score
+
+
+def position_planes(positions: list[Position]) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: uint8 array of shape (N, 12, 64), plane p holding a 1 on every square
+        of piece PLANE_PIECES[p] (white pawn..king, then black pawn..king).
+    """
+    bitboards = np.array(
+        [[position.bitboards[piece] for piece in PLANE_PIECES] for position in positions],
+        dtype="<u8",
+    ).reshape(len(positions), 12)
+    # little-endian bytes unpacked lowest bit first: bit n of a bitboard becomes square n
+    return np.unpackbits(bitboards.view(np.uint8), axis=-1, bitorder="little").reshape(
+        len(positions), 12, 64
+    )
+
+
+def evaluate_planes(planes: np.ndarray, turns: np.ndarray) -> np.ndarray:
+    """
+    scores positions given as piece planes, the same way as evaluate().
+
+    Args:
+        planes (np.ndarray): (N, 12, 64) array as made by position_planes().
+        turns (np.ndarray): (N,) side to move of every position, WHITE or BLACK.
+
+    Returns:
+        np.ndarray: (N,) int32 scores from the side to move's point of view.
+    """
+    sums = (planes.reshape(len(planes), 12 * 64).astype(np.float32) @ PLANE_WEIGHTS).astype(
+        np.int64
+    )
+    # the pawn planes packed back into bitboards for the set-wise pawn structure terms
+    pawns = np.packbits(planes[:, [0, 6]], axis=-1, bitorder="little").view("<u8")
+    pawn_mg, pawn_eg, _, _ = pawn_structure(pawns[:, 0, 0], pawns[:, 1, 0])
+    mg = sums[:, 0] + pawn_mg
+    eg = sums[:, 1] + pawn_eg
+    phase = np.minimum(sums[:, 2], MAX_PHASE)
+    scores = (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+    return np.where(np.asarray(turns) == WHITE, scores, -scores).astype(np.int32)
+
+
+def evaluate_many(positions: list[Position]) -> np.ndarray:
+    """
+    evaluate() for a batch of positions at once, vectorized with NumPy; for offline tools
+    scoring thousands of positions.
+
+    Returns:
+        np.ndarray: (N,) int32 scores, each from its side to move's point of view.
+    """
+    if not positions:
+        return np.zeros(0, dtype=np.int32)
+    turns = np.array([position.turn for position in positions])
+    return evaluate_planes(position_planes(positions), turns)
+
+
+# a king is worth more than anything it could capture in an exchange
+SEE_VALUES = [0, 100, 320, 330, 500, 900, 20000]
+
+
+def static_exchange(position: Position, move: int) -> int:
+    """
+    static exchange evaluation: the material the side to move wins (or loses, if negative)
+    when both sides keep recapturing on the move's target square with their least valuable
+    attacker, each free to stop when going on would lose. pins are ignored; x-ray attackers
+    behind a piece that captured join in as it leaves.
+
+    Args:
+        position (Position): the position before the move.
+        move (int): a capture or promotion of the side to move.
+
+    Returns:
+        int: centipawns.
+    """
+    from_square = move & 63
+    to_square = (move >> 6) & 63
+    flag = move >> 12
+    squares = position.squares
+    bitboards = position.bitboards
+    occupied = (position.occupied_co[0] | position.occupied_co[1]) ^ (1 << from_square)
+
+    attacker_value = SEE_VALUES[abs(squares[from_square])]
+    if flag == EN_PASSANT:
+        gain = SEE_VALUES[PAWN]
+        occupied ^= 1 << (to_square - 8 if position.turn == WHITE else to_square + 8)
+    elif flag & CAPTURE:
+        gain = SEE_VALUES[abs(squares[to_square])]
+    else:
+        gain = 0
+    if flag & PROMOTION:
+        promoted_value = SEE_VALUES[(flag & 3) + 2]
+        gain += promoted_value - SEE_VALUES[PAWN]
+        attacker_value = promoted_value
+
+    diagonal = bitboards[BISHOP] | bitboards[-BISHOP] | bitboards[QUEEN] | bitboards[-QUEEN]
+    straight = bitboards[ROOK] | bitboards[-ROOK] | bitboards[QUEEN] | bitboards[-QUEEN]
+    attackers = attackers_to(position, to_square, occupied) & occupied
+    gains = [gain]
+    side = position.turn ^ 1
+    while True:
+        sign = 1 if side == WHITE else -1
+        side_attackers = attackers & position.occupied_co[side]
+        if not side_attackers:
+            break
+        for kind in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            candidates = side_attackers & bitboards[kind * sign]
+            if candidates:
+                break
+        if kind == KING and attackers & position.occupied_co[side ^ 1]:
+            # the king can't recapture onto a defended square
+            break
+        # the piece on the square is the last capturer; capturing it gains its value
+        # every capture is kept: cutting the list short once the sign is settled would
+        # lose the amount
+        gains.append(attacker_value - gains[-1])
+        bit = candidates & -candidates
+        occupied ^= bit
+        if kind == PAWN or kind == BISHOP or kind == QUEEN:
+            attackers |= BISHOP_TABLES[to_square][occupied & BISHOP_MASKS[to_square]] & diagonal
+        if kind == ROOK or kind == QUEEN:
+            attackers |= ROOK_TABLES[to_square][occupied & ROOK_MASKS[to_square]] & straight
+        attackers &= occupied
+        attacker_value = SEE_VALUES[kind]
+        side ^= 1
+
+    # each side picks the better of capturing or standing still, from the last capture back
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+    return gains[0]
@@ -4,11 +4,35 @@ import logging
 import pygame
 from renderer import AbstractDrawable
 from texture_loader import TexturePack
-from datatypes import AvailableSpot
+from datatypes import AvailableSpot, Move
+import movegen
+from position import (
+    Position,
+    COLOR_NAMES,
+    PIECE_NAMES,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    WHITE,
+    ALL_CASTLING,
+    KING_CASTLE,
+    QUEEN_CASTLE,
+    EN_PASSANT,
+    PROMOTION,
+    CASTLING_ROOK_SQUARES,
+    encode_move,
+    promotion_piece,
+    piece_color,
+    piece_type,
+)
 import settings
 
 if TYPE_CHECKING:
     from player import AbstractPlayer
+    import datatypes
 
 
 class AbstractPiece(AbstractDrawable):
@@ -104,6 +128,12 @@ class AbstractPiece(AbstractDrawable):
         """
         coordinate = coordinate if coordinate else self.coordinate
 
+        # delegate to the bitboard generator when the board's position agrees with the sprite,
+        # the piece's own color decides its direction and captures then.
+        if settings.USE_BITBOARD_MOVEGEN and isinstance(board, Board):
+            if board.position.squares[board.square_of(coordinate)] == get_piece_code(self):
+                return board.find_available_spots(coordinate)
+
         # # try hitting cache
         # if available_spots := self.get_from_cache(coordinate):
         #     return available_spots
@@ -199,10 +229,28 @@ class Cell(AbstractDrawable):
 class Board(AbstractDrawable):
     CELL_COUNT = 8  # each chess board has 8 cells vertically and horizontally
 
-    def __init__(self, image):
+    def __init__(
+        self,
+        image,
+        position: Position | None = None,
+        white_on_bottom: bool = True,
+    ):
+        """
+        Args:
+            image: the board texture.
+            position (Position, optional): the headless position this board is a view of.
+            defaults to an empty position.
+            white_on_bottom (bool, optional): whether white's first rank is the bottom row (i == 7).
+        """
         super().__init__(image)
         logging.info("initializing board...")
         self.board: list[list[Cell]] = self._init_board()
+        self.position = position if position is not None else Position()
+        self.white_on_bottom = white_on_bottom
+        # needed by sync_sprites() to create sprites for pieces that appear in
+        # the position (promotions for example); get_board() sets them.
+        self.texture_pack: TexturePack | None = None
+        self.players: dict[str, "AbstractPlayer"] = {}
 
     def _init_board(self) -> list[list[Cell]]:
         """creates and initializes Cell objects, sets their width, hight, x and y
@@ -241,7 +289,9 @@ class Board(AbstractDrawable):
         Returns:
             board (Board): __description__
         """
-        board = Board(self.image.copy())
+        board = Board(self.image.copy(), self.position.copy(), self.white_on_bottom)
+        board.texture_pack = self.texture_pack
+        board.players = self.players
         filled_cells = self.get_filled_cells()
         for cell in filled_cells:
             piece = cell.piece
@@ -305,6 +355,163 @@ class Board(AbstractDrawable):
                     cells.append(cell)
         return cells
 
+    def square_of(self, coordinate: tuple[int, int]) -> int:
+        """converts a (row, col) coordinate of self.board to a position square (a1=0 ... h8=63)."""
+        rank = self.CELL_COUNT - 1 - coordinate[0] if self.white_on_bottom else coordinate[0]
+        return rank * 8 + coordinate[1]
+
+    def coordinate_of(self, square: int) -> tuple[int, int]:
+        """converts a position square back to a (row, col) coordinate of self.board."""
+        rank = square >> 3
+        i = self.CELL_COUNT - 1 - rank if self.white_on_bottom else rank
+        return (i, square & 7)
+
+    def to_position_move(self, move: "datatypes.Move") -> int:
+        """
+        converts a move made on this board to a position move (see position.encode_move).
+        must be called before the move is executed.
+
+        castling is made by moving the rook onto the king (see Rook.calculate_moves),
+        so it is translated to the king's move that position.Position expects.
+        """
+        spot = move.dest
+        if spot.is_castling:
+            king_square = self.square_of(spot.coordinate)
+            king_new_square = self.square_of(spot.castling_details["king_new_pos"])
+            flag = KING_CASTLE if king_new_square > king_square else QUEEN_CASTLE
+            return encode_move(king_square, king_new_square, flag)
+
+        from_square = self.square_of(move.source)
+        to_square = self.square_of(spot.coordinate)
+        if spot.is_en_passant:
+            return encode_move(from_square, to_square, EN_PASSANT)
+        promotion = piece_class_to_type[string_to_piece_class[spot.promotion_piece]]
+        return self.position.infer_move(from_square, to_square, promotion)
+
+    def to_board_move(self, move: int) -> Move:
+        """the reverse of to_position_move: converts a position move to a move on this board."""
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        flag = move >> 12
+        if flag == KING_CASTLE or flag == QUEEN_CASTLE:
+            rook_from, rook_to = CASTLING_ROOK_SQUARES[(from_square, to_square)]
+            king_coordinate = self.coordinate_of(from_square)
+            spot = AvailableSpot(
+                king_coordinate,
+                is_castling=True,
+                target_cell=self.get_cell(*king_coordinate),
+            )
+            spot.set_castling_details(
+                rook_new_pos=self.coordinate_of(rook_to),
+                king_new_pos=self.coordinate_of(to_square),
+            )
+            return Move(source=self.coordinate_of(rook_from), dest=spot)
+
+        to_coordinate = self.coordinate_of(to_square)
+        if flag == EN_PASSANT:
+            captured_square = to_square - 8 if to_square > from_square else to_square + 8
+            spot = AvailableSpot(
+                to_coordinate,
+                is_en_passant=True,
+                target_cell=self.get_cell(*self.coordinate_of(captured_square)),
+            )
+        elif flag & PROMOTION:
+            spot = AvailableSpot(
+                to_coordinate,
+                is_promotion=True,
+                promotion_piece=PIECE_NAMES[promotion_piece(move)],
+            )
+        else:
+            spot = AvailableSpot(to_coordinate)
+        return Move(source=self.coordinate_of(from_square), dest=spot)
+
+    def get_legal_moves(self, color: str | None = None) -> list[int]:
+        """legal position moves of a color (defaults to the side to move), see movegen.generate_legal_moves."""
+        color_index = None if color is None else COLOR_NAMES.index(color)
+        return movegen.generate_legal_moves(self.position, color_index)
+
+    def find_available_spots(self, coordinate: tuple[int, int]) -> list[AvailableSpot]:
+        """
+        legal available spots of the piece on a cell, generated by movegen from self.position
+        and translated to the AvailableSpot conventions of the piece classes:
+        castling belongs to the rook (it moves onto the king) and pawns only promote to queens.
+
+        Args:
+            coordinate (tuple[int, int]): the (row, col) of the piece.
+
+        Returns:
+            list[AvailableSpot]
+        """
+        position = self.position
+        square = self.square_of(coordinate)
+        piece = position.squares[square]
+        if not piece:
+            return []
+        color = piece_color(piece)
+        sources = 1 << square
+        if piece_type(piece) == ROOK:
+            sources |= 1 << position.king_squares[color]
+
+        available_spots = []
+        for move in movegen.generate_legal_moves(position, color, sources):
+            flag = move >> 12
+            if flag == KING_CASTLE or flag == QUEEN_CASTLE:
+                if CASTLING_ROOK_SQUARES[(move & 63, (move >> 6) & 63)][0] != square:
+                    continue
+            elif move & 63 != square:
+                continue
+            elif flag & PROMOTION and promotion_piece(move) != QUEEN:
+                continue
+            available_spots.append(self.to_board_move(move).dest)
+        return available_spots
+
+    def _create_piece(self, piece: int, coordinate: tuple[int, int]) -> AbstractPiece:
+        color = COLOR_NAMES[piece_color(piece)]
+        name = PIECE_NAMES[piece_type(piece)]
+        size = settings.PIECE_WIDTH_HIGHT
+        if self.texture_pack is not None:
+            texture = self.texture_pack.get_texture(
+                settings.TEXTURE_NAMES[f"{color[0]}_{name}"], size
+            )
+        else:
+            texture = pygame.Surface(size)
+        return string_to_piece_class[name](texture, self.players[color], coordinate)
+
+    def sync_sprites(self, spare_sprites: list[AbstractPiece] | None = None):
+        """
+        makes the cells match self.position: sprites that are no longer where the position
+        says are reused for pieces of the same kind that are missing, new sprites are created
+        for the rest (e.g. a promoted queen), and cells that should be empty get emptied.
+        sprites that already match (the common case after a move) are left untouched so their
+        animations keep running.
+
+        Args:
+            spare_sprites (list[AbstractPiece], optional): sprites that are off the board
+            (e.g. captured pieces when a move is taken back), reused before creating new ones.
+        """
+        squares = self.position.squares
+        spares: dict[int, list[AbstractPiece]] = {}
+        for sprite in spare_sprites or []:
+            spares.setdefault(get_piece_code(sprite), []).append(sprite)
+        missing: list[tuple[Cell, int]] = []
+        for row in self.board:
+            for cell in row:
+                piece = squares[self.square_of(cell.coordinate)]
+                if cell.piece is not None:
+                    if get_piece_code(cell.piece) == piece:
+                        continue
+                    spares.setdefault(get_piece_code(cell.piece), []).append(cell.piece)
+                    cell.rem_piece()
+                if piece:
+                    missing.append((cell, piece))
+
+        for cell, piece in missing:
+            sprites = spares.get(piece)
+            sprite = sprites.pop() if sprites else self._create_piece(piece, cell.coordinate)
+            sprite.rect.x = cell.rect.x
+            sprite.rect.y = cell.rect.y
+            cell.set_piece(sprite)
+
     def __getitem__(self, i: SupportsIndex):
         return self.board[i]
 
@@ -380,8 +587,6 @@ class Pawn(SpecialPiece):
                     )
 
                 # en passant
-                print("while handling en-passant...")
-                print(f"piece_i: {piece_i}, piece_j: {piece_j}")
                 if piece_i == 3 or piece_i == 4:
                     side_cell = board.get_cell(piece_i, piece_j + horizontal_direction)
                     dest_coordinate = (
@@ -395,10 +600,6 @@ class Pawn(SpecialPiece):
                         continue
                     if not isinstance(side_cell.piece, Pawn):
                         continue
-                    print(f"side_cell.piece: {side_cell.piece}")
-                    print(
-                        f"can piece has_done_1_move?: {side_cell.piece.moves_count == 1}"
-                    )
                     if not side_cell.piece.moves_count == 1:
                         continue
                     if side_cell.piece.color == color:
@@ -691,6 +892,21 @@ string_to_piece_class = {
     "king": King,
 }
 
+piece_class_to_type = {
+    Pawn: PAWN,
+    Knight: KNIGHT,
+    Bishop: BISHOP,
+    Rook: ROOK,
+    Queen: QUEEN,
+    King: KING,
+}
+
+
+def get_piece_code(piece: AbstractPiece) -> int:
+    """the position.Position code of a piece sprite (positive for white, negative for black)."""
+    kind = piece_class_to_type[type(piece)]
+    return kind if piece.color == "white" else -kind
+
 
 def get_board(
     texture_pack: TexturePack, player1: "AbstractPlayer", player2: "AbstractPlayer"
@@ -710,23 +926,23 @@ def get_board(
     board_texture = texture_pack.get_texture(
         settings.TEXTURE_NAMES["board"], settings.BOARD_WIDTH_HIGHT
     )
-    board = Board(image=board_texture)
+    board = Board(image=board_texture, white_on_bottom=player1.color == "white")
+    board.texture_pack = texture_pack
+    board.players = {player1.color: player1, player2.color: player2}
 
-    # attaching pieces
+    # placing pieces on the position, the sprites are created from it
+    position = board.position
     piece_positions = settings.get_piece_positions(player1)
     for piece_name in piece_positions.keys():
-        piece_texture = texture_pack.get_texture(
-            settings.TEXTURE_NAMES[piece_name], settings.PIECE_WIDTH_HIGHT
-        )
-        Piece = string_to_piece_class[piece_name[2:]]
-        player = player1 if player1.color[0] == piece_name[0] else player2
-
+        kind = piece_class_to_type[string_to_piece_class[piece_name[2:]]]
+        piece = kind if piece_name[0] == "w" else -kind
         for pos in piece_positions[piece_name]:
-            cell = board.get_cell(*pos)
-            piece = Piece(piece_texture, player, pos)
-            piece.rect.x = cell.rect.x
-            piece.rect.y = cell.rect.y
-            cell.set_piece(piece)
+            position.put_piece(board.square_of(pos), piece)
+    position.turn = WHITE
+    position.castling = ALL_CASTLING
+    # put_piece keeps the key up to date, but not the castling rights set directly
+    position.key = position.compute_key()
+    board.sync_sprites()
     return board
 
 
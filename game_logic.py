@@ -1,7 +1,12 @@
 import pygame
 import helpers
+import logging
 import settings
+import movegen
 from game_elements import Board, Cell, SpecialPiece
+from position import WHITE
+from pgn import PgnRecorder
+from time_manager import GameClock
 from motion import Motion
 from input_sources import get_clicked_pos
 from typing import TYPE_CHECKING
@@ -17,6 +22,8 @@ class GameLogic:
         player1: "AbstractPlayer",
         player2: "AbstractPlayer",
         motion: Motion,
+        clock: GameClock | None = None,
+        recorder: PgnRecorder | None = None,
     ):
         self.board = board
         self.player1 = player1
@@ -27,6 +34,16 @@ class GameLogic:
         self.available_cells_to_draw = []
         # this is used to draw the last move cell
         self.previous_move_source_cell = None
+        # set once the side to move has no legal moves: "1-0", "0-1" or "1/2-1/2"
+        self.result: str | None = None
+        # what undo_move() needs besides the position's own undo stack, one record per move:
+        # (moves_count of the special pieces involved, length of the mover's eaten_pieces,
+        # previous_move_source_cell)
+        self.undo_records: list[tuple[list[tuple[SpecialPiece, int]], int, object]] = []
+        # the players' clocks, None for a game without time control
+        self.clock = clock
+        # streams the moves to a PGN file as they are played, None to keep no record
+        self.recorder = recorder
 
     def switch_players(self):
         """Switches the current player to the other player."""
@@ -44,6 +61,74 @@ class GameLogic:
             source_cell.rect.copy(),
         )
 
+    def undo_move(self) -> bool:
+        """
+        takes back the last move: the position unmakes it from its undo stack, captured
+        sprites come back from eaten_pieces and the moves_count of the pieces involved is
+        restored. costs the same for every step, however long the game is.
+
+        Returns:
+            bool: False if there was no move to take back.
+        """
+        if not self.undo_records:
+            return False
+        moves_counts, eaten_count, previous_move_source_cell = self.undo_records.pop()
+        self.switch_players()
+        eaten_pieces = self.current_player.eaten_pieces
+        captured_sprites = eaten_pieces[eaten_count:]
+        del eaten_pieces[eaten_count:]
+
+        self.board.position.unmake_move()
+        if self.recorder is not None:
+            self.recorder.undo()
+        # sprites jump back to their cells, pending animations would drag them away again
+        self.motion.operations.clear()
+        self.board.sync_sprites(spare_sprites=captured_sprites)
+        for piece, moves_count in moves_counts:
+            piece.moves_count = moves_count
+
+        self.previous_move_source_cell = previous_move_source_cell
+        self.available_cells_to_draw.clear()
+        self.result = None
+        if self.clock is not None:
+            # the clocks aren't rewound, the side to move again just gets its clock back
+            self.clock.start(self.board.position.turn)
+        return True
+
+    def check_flag(self) -> bool:
+        """starts the clock on the first call and ends the game if the side to move ran out of time."""
+        turn = self.board.position.turn
+        if self.clock.running is None:
+            self.clock.start(turn)
+        if not self.clock.flagged(turn):
+            return False
+        self.result = "0-1" if turn == WHITE else "1-0"
+        self.clock.stop()
+        if self.recorder is not None:
+            self.recorder.finish(self.result)
+        logging.info(f"game over on time: {self.result}")
+        return True
+
+    def check_game_over(self) -> bool:
+        """sets self.result if the side to move is checkmated or stalemated, or if the game is
+        drawn by threefold repetition or the fifty-move rule.
+        """
+        position = self.board.position
+        if position.repetition_count() >= 2 or position.halfmove_clock >= 100:
+            self.result = "1/2-1/2"
+        elif movegen.has_legal_moves(position):
+            return False
+        elif movegen.in_check(position):
+            self.result = "0-1" if position.turn == WHITE else "1-0"
+        else:
+            self.result = "1/2-1/2"
+        if self.clock is not None:
+            self.clock.stop()
+        if self.recorder is not None:
+            self.recorder.finish(self.result)
+        logging.info(f"game over: {self.result}")
+        return True
+
     def handle_simple_clicks(self, events: list[pygame.event.Event]):
         mouse_pos = get_clicked_pos(events)
         if mouse_pos is None:
@@ -102,7 +187,10 @@ class GameLogic:
         self.execute_move(rook_cell, rook_new_cell)
         self.execute_move(king_cell, king_new_cell)
 
-    def handle_promotion(self, player_input: "PlayerInput"): ...
+    def handle_promotion(self, player_input: "PlayerInput"):
+        # the pawn moves like a normal piece, its sprite is swapped for the promoted
+        # piece when the board syncs from the position
+        self.handle_normal_moves(player_input)
 
     def handle_special_moves(self, player_input: "PlayerInput") -> bool:
         """Handles special moves like castling, en-passant, promotion, etc.
@@ -142,11 +230,29 @@ class GameLogic:
         Returns:
             player_input ("PlayerInput"): The input from the current player.
         """
+        if self.result is not None:
+            return False
+        if self.clock is not None and self.check_flag():
+            return False
         player_input: "PlayerInput" = self.current_player.get_input(self.board, events)
         if player_input is None:
             return False
         source_cell, dest_cell = player_input.get_cells(self.board)
+        # translated before the cells change, the flags are derived from the current position
+        position_move = self.board.to_position_move(player_input.move)
 
+        moves_counts = [
+            (piece, piece.moves_count)
+            for piece in (source_cell.piece, dest_cell.piece)
+            if isinstance(piece, SpecialPiece)
+        ]
+        self.undo_records.append(
+            (
+                moves_counts,
+                len(self.current_player.eaten_pieces),
+                self.previous_move_source_cell,
+            )
+        )
         self.add_previous_move_source_cell(source_cell)
 
         # handle special moves like castling, en-passant, promotion, etc...
@@ -161,6 +267,16 @@ class GameLogic:
         if not special_move_made:
             self.handle_normal_moves(player_input)
 
+        # the position is the source of truth, the sprites only follow it
+        # (a pawn reaching the last rank becomes a queen here for example)
+        if self.recorder is not None:
+            self.recorder.add_move(self.board.position, position_move)
+        self.board.position.make_move(position_move)
+        self.board.sync_sprites()
+        if self.clock is not None:
+            self.clock.press(self.board.position.turn ^ 1)
+        self.check_game_over()
+
         # add this line because if other player (possibly the bot) does a move
         # while the player have already clicked on a piece the available cells for that piece
         # should not no longer be displayed so we should clear the available_cells_to_draw
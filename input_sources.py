@@ -1,9 +1,15 @@
+import logging
 import pygame
-import random
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
-import helpers
+import os
+import time
 import datatypes
+import settings
+from book import OpeningBook
+from position import move_to_uci
+from search_worker import SearchWorker
+from time_manager import GameClock, TimeManager, seconds_to_ns
 
 if TYPE_CHECKING:
     from game_elements import Board
@@ -47,6 +53,14 @@ class AbstractInputSource(ABC):
         """
         pass
 
+    def cancel(self):
+        """drops any work in progress on a move; called when the game changes under it."""
+        pass
+
+    def close(self):
+        """releases what the input source holds on to (threads, processes) when the game ends."""
+        pass
+
 
 class Human(AbstractInputSource):
     def __init__(self):
@@ -87,9 +101,60 @@ class Human(AbstractInputSource):
 
 
 class Bot(AbstractInputSource):
-    def __init__(self):
+    def __init__(
+        self,
+        worker: SearchWorker | None = None,
+        clock: GameClock | None = None,
+        book: OpeningBook | None = None,
+    ):
+        """
+        Args:
+            worker (SearchWorker, optional): runs the search; one is made from settings if None.
+            clock (GameClock, optional): the game's clock; searches are budgeted from it
+            instead of settings.BOT_THINK_TIME.
+            book (OpeningBook, optional): played without searching while it has moves;
+            settings.BOOK_PATH is opened if None and the file exists.
+        """
         super().__init__()
-        self.time_elapsed = None
+        if book is None and settings.BOOK_PATH and os.path.isfile(settings.BOOK_PATH):
+            book = OpeningBook(settings.BOOK_PATH)
+            logging.info(f"loaded {book}")
+        self.book = book
+        self.clock = clock
+        # monotonic_ns() before which a found move is held back, so the bot doesn't
+        # move instantly
+        self.earliest_move_ns: int | None = None
+        # the engine runs in the worker's process; get_input only polls it
+        self.worker = worker or SearchWorker(
+            settings.BOT_SEARCH_DEPTH,
+            settings.BOT_THINK_TIME,
+            settings.TRANSPOSITION_TABLE_MB,
+            settings.BOT_SEARCH_WORKERS,
+            settings.TABLEBASE_DIR,
+            settings.PAWN_HASH_ENTRIES,
+        )
+        # (key, ply) of the position the worker is searching for us
+        self.searched_position: tuple[int, int] | None = None
+        self.result = None
+        # (key, ply) of the position being searched on the opponent's time
+        self.pondered_position: tuple[int, int] | None = None
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+
+    def _time_manager(self, position) -> TimeManager:
+        if self.clock is not None:
+            return self.clock.time_manager(position.turn)
+        return TimeManager.fixed(self.worker.time_limit)
+
+    def _start_pondering(self, position, result):
+        """searches the position after our move and the reply the search expects."""
+        if not settings.BOT_PONDER or len(result.pv) < 2:
+            return
+        position = position.copy()
+        position.make_move(result.pv[0])
+        position.make_move(result.pv[1])
+        self.worker.ponder(position)
+        self.pondered_position = (position.key, len(position.undo_stack))
 
     # def get_board_copy(self, board: Board) -> Board:
     #     """
@@ -102,24 +167,58 @@ class Bot(AbstractInputSource):
         self, color: str, board: "Board", events: list[pygame.event.Event] = None
     ) -> "datatypes.Move | None":
         # we are not using `events` parameter here.
-        if self.time_elapsed is None:
-            self.time_elapsed = helpers.check_time_passed(1)
+        position = board.position
+        searched_position = (position.key, len(position.undo_stack))
+        if searched_position != self.searched_position:
+            # our turn just started, or the game changed under the search (undo, new game)
+            book_move = self.book.pick(position) if self.book is not None else None
+            if book_move is not None:
+                self.worker.cancel()
+                self.pondered_position = None
+                self.searched_position = None
+                logging.info(f"{color} bot: book move {move_to_uci(book_move)}")
+                return board.to_board_move(book_move)
+            if self.pondered_position is None:
+                self.worker.start(position, self._time_manager(position))
+            elif searched_position == self.pondered_position:
+                # the opponent played the expected move, the ponder search goes on
+                self.worker.ponderhit(self._time_manager(position))
+                self.ponder_hits += 1
+            else:
+                self.worker.start(position, self._time_manager(position))
+                self.ponder_misses += 1
+            self.pondered_position = None
+            self.searched_position = searched_position
+            self.result = None
+            self.earliest_move_ns = time.monotonic_ns() + seconds_to_ns(settings.BOT_MIN_MOVE_TIME)
+            return None
+        if self.result is None:
+            self.result = self.worker.poll()
+            if self.result is None:
+                return None
+        if time.monotonic_ns() < self.earliest_move_ns:
             return None
-        if not next(self.time_elapsed):
+
+        result = self.result
+        self.searched_position = None
+        self.result = None
+        if result.move is None:
             return None
-        cells = [cell for cell in board.get_filled_cells() if cell.piece.color == color]
-        possible_destinations = []
-        while 1:
-            source = random.choice(cells)
-            available_spots = source.piece.find_available_spots(
-                board, color=color, opponent=True
-            )
-            if available_spots:
-                possible_destinations = available_spots
-                break
-
-        dest = random.choice(possible_destinations)
-
-        # reset self.time_elapsed
-        self.time_elapsed = None
-        return datatypes.Move(source=source.coordinate, dest=dest)
+        logging.info(
+            f"{color} bot: {result} {self.worker.search_stats} "
+            f"ponder hits {self.ponder_hits}/{self.ponder_hits + self.ponder_misses}"
+        )
+        self._start_pondering(position, result)
+        return board.to_board_move(result.move)
+
+    def cancel(self):
+        self.worker.cancel()
+        self.searched_position = None
+        self.pondered_position = None
+        self.result = None
+
+    def close(self):
+        self.cancel()
+        self.worker.close()
+        if self.book is not None:
+            self.book.close()
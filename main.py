@@ -1,5 +1,7 @@
 import logging
+import os
 import pygame
+from archive import ArchiveWriter, GameArchive
 from motion import Motion
 from game_logic import GameLogic
 from texture_loader import TexturePackLoader
@@ -7,6 +9,11 @@ import settings
 import game_elements
 import player
 import input_sources
+from pgn import PgnRecorder
+from notation import move_to_san
+from position_index import PositionIndex, index_directory
+from position import WHITE, BLACK
+from time_manager import GameClock
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -24,16 +31,57 @@ class Game:
 
         self.renderer = Renderer(self.screen)
         self.clock = pygame.time.Clock()
-        self.moves = []
         self.is_game_running = False
+        self._caption = None
+        # opened on the first explorer keypress, then reused
+        self._position_index: PositionIndex | None = None
 
     def _handle_closing_event(self, events: list[pygame.event.Event]):
         for event in events:
             if event.type == pygame.QUIT:
                 self.is_game_running = False
 
-    def add_move(self, move: "player.PlayerInput"):
-        self.moves.append((move))
+    def _handle_undo_event(self, events: list[pygame.event.Event]):
+        """backspace takes back moves until it is a human's turn again."""
+        for event in events:
+            if event.type != pygame.KEYDOWN or event.key != settings.UNDO_KEY:
+                continue
+            while self.game_logic.undo_move():
+                if isinstance(self.game_logic.current_player.input_source, input_sources.Human):
+                    break
+            for game_player in (self.game_logic.player1, self.game_logic.player2):
+                game_player.input_source.cancel()
+
+    def _handle_explorer_event(self, events: list[pygame.event.Event]):
+        """logs the moves the archived games played from the board's position."""
+        if settings.ARCHIVE_PATH is None:
+            return
+        for event in events:
+            if event.type != pygame.KEYDOWN or event.key != settings.EXPLORER_KEY:
+                continue
+            if self._position_index is None:
+                directory = index_directory(settings.ARCHIVE_PATH)
+                if not os.path.isdir(directory):
+                    logging.info("no archived games indexed yet")
+                    continue
+                self._position_index = PositionIndex(directory)
+            position = self.game_logic.board.position
+            rows = self._position_index.explore(position)
+            for move, games, white_wins, draws, black_wins in rows:
+                name = move_to_san(position, move) if move else "(end)"
+                logging.info(f"{name:<8} {games:>6} games  +{white_wins} ={draws} -{black_wins}")
+            if not rows:
+                logging.info("no archived game reached this position")
+
+    def _update_caption(self):
+        """shows the players' remaining time in the window title when the game is timed."""
+        game_clock = self.game_logic.clock
+        if game_clock is None:
+            return
+        caption = f"white {game_clock.format(WHITE)} - black {game_clock.format(BLACK)}"
+        if caption != self._caption:
+            pygame.display.set_caption(caption)
+            self._caption = caption
 
     def main_loop(self):
         self.is_game_running = True
@@ -43,6 +91,8 @@ class Game:
 
             events = pygame.event.get()
             self._handle_closing_event(events)
+            self._handle_undo_event(events)
+            self._handle_explorer_event(events)
             # handling simple clicks
             self.game_logic.handle_simple_clicks(events)
 
@@ -51,6 +101,7 @@ class Game:
 
             # applying animations
             self.motion.apply_motion()
+            self._update_caption()
 
             # drawing stuff
             drawables: list["AbstractDrawable"] = [self.game_logic.board]
@@ -63,14 +114,48 @@ class Game:
             self.renderer.bulk_add_items(drawables)
             self.renderer.draw_items(self.screen, update_display=True)
 
+        # a bot may still be thinking in the background
+        for game_player in (self.game_logic.player1, self.game_logic.player2):
+            game_player.input_source.close()
+        if self.game_logic.recorder is not None:
+            self.game_logic.recorder.close()
+            logging.info(f"game saved to {self.game_logic.recorder.path}")
+        self._archive_game()
+
+    def _archive_game(self):
+        """appends the game to settings.ARCHIVE_PATH, if set and if any move was played."""
+        position = self.game_logic.board.position
+        if settings.ARCHIVE_PATH is None or not position.undo_stack:
+            return
+        players = {p.color: p.name for p in (self.game_logic.player1, self.game_logic.player2)}
+        directory = os.path.dirname(settings.ARCHIVE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with ArchiveWriter(settings.ARCHIVE_PATH) as writer:
+            number = writer.add_position(
+                position, self.game_logic.result or "*", players["white"], players["black"]
+            )
+        logging.info(f"game archived as number {number} in {settings.ARCHIVE_PATH}")
+        if settings.INDEX_POSITIONS:
+            if self._position_index is None:
+                self._position_index = PositionIndex(index_directory(settings.ARCHIVE_PATH))
+            # update() swaps the new segments in, so the explorer sees them
+            with GameArchive(settings.ARCHIVE_PATH) as archive:
+                self._position_index.update(archive)
+            logging.info(f"position index updated: {self._position_index}")
+
 
 if __name__ == "__main__":
     texture_pack = TexturePackLoader(settings.TEXTURE_DIR).get_pack(
         settings.DEFAULT_TEXTURE_PACK
     )
 
+    game_clock = None
+    if settings.CLOCK_MINUTES is not None:
+        game_clock = GameClock(settings.CLOCK_MINUTES * 60, settings.CLOCK_INCREMENT_SECONDS)
+
     human = input_sources.Human()
-    bot = input_sources.Bot()
+    bot = input_sources.Bot(clock=game_clock)
     player1 = player.Player(
         name="Player 1",
         color="white",
@@ -83,6 +168,16 @@ if __name__ == "__main__":
     )
 
     board = game_elements.get_board(texture_pack, player1, player2)
-    game_logic = GameLogic(board, player1, player2, Motion(settings.MOVEMENT_SPEED))
+    recorder = None
+    if settings.PGN_DIR is not None:
+        recorder = PgnRecorder.new_game(
+            settings.PGN_DIR,
+            player1.name,
+            player2.name,
+            fsync_interval=settings.PGN_FSYNC_SECONDS,
+        )
+    game_logic = GameLogic(
+        board, player1, player2, Motion(settings.MOVEMENT_SPEED), game_clock, recorder
+    )
     game = Game(game_logic)
     game.main_loop()
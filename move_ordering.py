@@ -0,0 +1,131 @@
+"""Move ordering for engine.Engine.
+
+alpha-beta cuts off sooner the earlier it meets the best move, so moves are tried in
+this order: the transposition table move, captures by MVV-LVA (most valuable victim,
+then least valuable attacker), the two killer moves of the ply (quiet moves that caused
+a cutoff in a sibling node), the other quiet moves by their history score (how often
+the same from/to caused cutoffs anywhere in the tree, weighted by depth) and last the
+captures that lose material by static exchange evaluation.
+
+MoveOrderer.pick() generates them in the same stages, lazily: the search stops
+iterating when a move fails high, so nodes cut off by the table move or a capture never
+generate their quiet moves.
+"""
+
+from typing import Iterator
+from evaluation import static_exchange, SEE_VALUES
+from movegen import generate_legal_moves, NOISY_MOVES, QUIET_MOVES
+from position import Position, PAWN, CAPTURE, PROMOTION, EN_PASSANT
+
+# history scores are halved everywhere once one of them reaches this
+HISTORY_MAX = 1 << 18
+
+
+def mvv_lva(position: Position, move: int) -> int:
+    """
+    a capture's (or promotion's) rank among the noisy moves: victim first, attacker second.
+    a promotion counts the new piece as the victim.
+    """
+    squares = position.squares
+    flag = move >> 12
+    attacker = abs(squares[move & 63])
+    if flag == EN_PASSANT:
+        victim = PAWN
+    elif flag & CAPTURE:
+        victim = abs(squares[(move >> 6) & 63])
+    else:
+        victim = 0
+    if flag & PROMOTION:
+        victim += (flag & 3) + 2
+    return victim * 8 - attacker
+
+
+def losing_capture(position: Position, move: int) -> bool:
+    """whether a capture (not a promotion) loses material by static exchange evaluation."""
+    flag = move >> 12
+    if not flag & CAPTURE or flag & PROMOTION:
+        return False
+    squares = position.squares
+    victim = PAWN if flag == EN_PASSANT else abs(squares[(move >> 6) & 63])
+    # winning a piece at least as valuable as the capturer can't lose material
+    if SEE_VALUES[victim] >= SEE_VALUES[abs(squares[move & 63])]:
+        return False
+    return static_exchange(position, move) < 0
+
+
+class MoveOrderer:
+    def __init__(self, max_ply: int = 128):
+        """
+        Args:
+            max_ply (int, optional): deepest ply killers are kept for. Defaults to 128.
+        """
+        self.max_ply = max_ply
+        # two killer moves per ply, the most recent first
+        self.killers: list[list[int]] = [[0, 0] for _ in range(max_ply + 1)]
+        # history[color * 4096 + from * 64 + to]
+        self.history: list[int] = [0] * (2 * 64 * 64)
+
+    def new_search(self):
+        """killers only make sense inside one tree; history is kept but halved."""
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        self.history = [value >> 1 for value in self.history]
+
+    def pick(self, position: Position, table_move: int, ply: int) -> Iterator[int]:
+        """
+        yields the legal moves of the side to move, best first, generating each stage
+        only when the previous one is exhausted. the position must not change between
+        steps of the iteration (make and unmake each move before taking the next).
+
+        Args:
+            position (Position): the node's position.
+            table_move (int): the transposition table move, 0 if there is none.
+            ply (int): distance from the root, selects the killer moves.
+        """
+        if table_move:
+            # the table move may come from another position with the same index bits
+            if table_move in generate_legal_moves(position, sources=1 << (table_move & 63)):
+                yield table_move
+            else:
+                table_move = 0
+
+        noisy = generate_legal_moves(position, kinds=NOISY_MOVES)
+        noisy.sort(key=lambda move: mvv_lva(position, move), reverse=True)
+        # captures losing material by static exchange wait until after the quiet moves
+        losing = []
+        for move in noisy:
+            if move == table_move:
+                continue
+            if losing_capture(position, move):
+                losing.append(move)
+            else:
+                yield move
+
+        quiets = generate_legal_moves(position, kinds=QUIET_MOVES)
+        killers = self.killers[ply]
+        for killer in killers:
+            if killer and killer != table_move and killer in quiets:
+                yield killer
+        history = self.history
+        turn = position.turn << 12
+        quiets.sort(key=lambda move: history[turn | move & 0xFFF], reverse=True)
+        for move in quiets:
+            if move != table_move and move != killers[0] and move != killers[1]:
+                yield move
+        yield from losing
+
+    def update(self, position: Position, move: int, depth: int, ply: int):
+        """
+        records a move that caused a beta cutoff; only quiet moves become killers and earn
+        history. call it before the move is made.
+        """
+        if move >> 12 & (CAPTURE | PROMOTION):
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        index = position.turn << 12 | move & 0xFFF
+        self.history[index] += depth * depth
+        if self.history[index] >= HISTORY_MAX:
+            self.history = [value >> 1 for value in self.history]
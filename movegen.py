@@ -0,0 +1,403 @@
+"""Bitboard move generation for position.Position.
+
+moves are the plain ints of position.encode_move, so generating a position costs
+no object allocation besides the list of moves.
+"""
+
+from bitboards import (
+    FULL,
+    FILE_A,
+    FILE_H,
+    RANK_1,
+    RANK_8,
+    KNIGHT_ATTACKS,
+    KING_ATTACKS,
+    PAWN_ATTACKS,
+    ROOK_MASKS,
+    ROOK_TABLES,
+    BISHOP_MASKS,
+    BISHOP_TABLES,
+    BETWEEN,
+    LINE,
+    pawn_pushes,
+)
+from position import (
+    Position,
+    WHITE,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    NO_SQUARE,
+    QUIET,
+    WHITE_KINGSIDE,
+    WHITE_QUEENSIDE,
+    BLACK_KINGSIDE,
+    BLACK_QUEENSIDE,
+    DOUBLE_PAWN_PUSH,
+    KING_CASTLE,
+    QUEEN_CASTLE,
+    CAPTURE,
+    EN_PASSANT,
+    PROMOTION,
+    PROMOTION_CAPTURE,
+)
+
+# what generate_moves / generate_legal_moves produce: noisy moves are captures (en passant
+# included) and promotions, quiet moves are everything else (castling included)
+NOISY_MOVES = 1
+QUIET_MOVES = 2
+ALL_MOVES = NOISY_MOVES | QUIET_MOVES
+
+# king home square, then per side: (rights, king to, rook, squares that must be empty,
+# squares the king passes and lands on, flag)
+CASTLING_MOVES = (
+    (
+        4,
+        (
+            (WHITE_KINGSIDE, 6, 1 << 7, 0x60, (5, 6), KING_CASTLE),
+            (WHITE_QUEENSIDE, 2, 1 << 0, 0x0E, (3, 2), QUEEN_CASTLE),
+        ),
+    ),
+    (
+        60,
+        (
+            (BLACK_KINGSIDE, 62, 1 << 63, 0x60 << 56, (61, 62), KING_CASTLE),
+            (BLACK_QUEENSIDE, 58, 1 << 56, 0x0E << 56, (59, 58), QUEEN_CASTLE),
+        ),
+    ),
+)
+CASTLING_RIGHTS = (WHITE_KINGSIDE | WHITE_QUEENSIDE, BLACK_KINGSIDE | BLACK_QUEENSIDE)
+
+
+def attackers_to(position: Position, square: int, occupied: int) -> int:
+    """bitboard of the pieces of both colors attacking a square, given an occupancy."""
+    bitboards = position.bitboards
+    rooks_queens = bitboards[ROOK] | bitboards[QUEEN] | bitboards[-ROOK] | bitboards[-QUEEN]
+    bishops_queens = (
+        bitboards[BISHOP] | bitboards[QUEEN] | bitboards[-BISHOP] | bitboards[-QUEEN]
+    )
+    return (
+        (PAWN_ATTACKS[1][square] & bitboards[PAWN])
+        | (PAWN_ATTACKS[0][square] & bitboards[-PAWN])
+        | (KNIGHT_ATTACKS[square] & (bitboards[KNIGHT] | bitboards[-KNIGHT]))
+        | (KING_ATTACKS[square] & (bitboards[KING] | bitboards[-KING]))
+        | (ROOK_TABLES[square][occupied & ROOK_MASKS[square]] & rooks_queens)
+        | (BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]] & bishops_queens)
+    )
+
+
+def is_square_attacked(position: Position, square: int, by_color: int) -> bool:
+    bitboards = position.bitboards
+    sign = 1 if by_color == WHITE else -1
+    if PAWN_ATTACKS[by_color ^ 1][square] & bitboards[PAWN * sign]:
+        return True
+    if KNIGHT_ATTACKS[square] & bitboards[KNIGHT * sign]:
+        return True
+    if KING_ATTACKS[square] & bitboards[KING * sign]:
+        return True
+    occupied = position.occupied_co[0] | position.occupied_co[1]
+    queens = bitboards[QUEEN * sign]
+    if ROOK_TABLES[square][occupied & ROOK_MASKS[square]] & (bitboards[ROOK * sign] | queens):
+        return True
+    if BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]] & (bitboards[BISHOP * sign] | queens):
+        return True
+    return False
+
+
+def _is_attacked_with(position: Position, square: int, by_color: int, occupied: int) -> bool:
+    """like is_square_attacked, but sliders see through an explicitly given occupancy."""
+    bitboards = position.bitboards
+    sign = 1 if by_color == WHITE else -1
+    if PAWN_ATTACKS[by_color ^ 1][square] & bitboards[PAWN * sign]:
+        return True
+    if KNIGHT_ATTACKS[square] & bitboards[KNIGHT * sign]:
+        return True
+    if KING_ATTACKS[square] & bitboards[KING * sign]:
+        return True
+    queens = bitboards[QUEEN * sign]
+    if ROOK_TABLES[square][occupied & ROOK_MASKS[square]] & (bitboards[ROOK * sign] | queens):
+        return True
+    if BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]] & (bitboards[BISHOP * sign] | queens):
+        return True
+    return False
+
+
+def checkers_and_pins(position: Position, color: int) -> tuple[int, dict[int, int]]:
+    """
+    finds the enemy pieces giving check to a color's king and the pieces pinned against it.
+
+    Returns:
+        tuple[int, dict[int, int]]: the checkers bitboard, and for each pinned square the
+        line (through the king and the pinner) the pinned piece may still move on.
+    """
+    king = position.king_squares[color]
+    them = color ^ 1
+    sign = -1 if color == WHITE else 1
+    bitboards = position.bitboards
+    us_bb = position.occupied_co[color]
+    occupied = us_bb | position.occupied_co[them]
+    checkers = attackers_to(position, king, occupied) & position.occupied_co[them]
+
+    pins = {}
+    queens = bitboards[QUEEN * sign]
+    snipers = (ROOK_TABLES[king][0] & (bitboards[ROOK * sign] | queens)) | (
+        BISHOP_TABLES[king][0] & (bitboards[BISHOP * sign] | queens)
+    )
+    while snipers:
+        bit = snipers & -snipers
+        snipers ^= bit
+        sniper = bit.bit_length() - 1
+        blockers = BETWEEN[king][sniper] & occupied
+        if blockers and not blockers & (blockers - 1) and blockers & us_bb:
+            pins[blockers.bit_length() - 1] = LINE[king][sniper]
+    return checkers, pins
+
+
+def generate_legal_moves(
+    position: Position, color: int | None = None, sources: int = FULL, kinds: int = ALL_MOVES
+) -> list[int]:
+    """
+    generates the legal moves of a color. checkers and pinned pieces are computed once, then
+    the pseudo-legal moves are filtered in a single pass without making any of them:
+    king moves must land on squares the enemy does not attack (with the king lifted off the
+    board), in check the other moves must capture the checker or block it, pinned pieces must
+    stay on their pin line, and en-passant is checked against discovered attacks on the king.
+
+    Args:
+        position (Position): the position to generate moves for.
+        color (int, optional): WHITE or BLACK, defaults to the side to move.
+        sources (int, optional): bitboard restricting the squares the moves start from.
+        kinds (int, optional): NOISY_MOVES, QUIET_MOVES or ALL_MOVES (the default).
+
+    Returns:
+        list[int]: moves encoded with position.encode_move.
+    """
+    color = position.turn if color is None else color
+    them = color ^ 1
+    king = position.king_squares[color]
+    if king == NO_SQUARE:
+        return generate_moves(position, color, sources, kinds)
+    king_bit = 1 << king
+    occupied = position.occupied_co[0] | position.occupied_co[1]
+    checkers, pins = checkers_and_pins(position, color)
+
+    legal = []
+    if sources & king_bit:
+        without_king = occupied ^ king_bit
+        for move in generate_moves(position, color, king_bit, kinds):
+            flag = move >> 12
+            if flag == KING_CASTLE or flag == QUEEN_CASTLE:
+                # the generator already checked the squares the king crosses
+                legal.append(move)
+            elif not _is_attacked_with(position, (move >> 6) & 63, them, without_king):
+                legal.append(move)
+
+    # in double check only the king can move
+    if checkers & (checkers - 1):
+        return legal
+
+    moves = generate_moves(position, color, sources & ~king_bit, kinds)
+    if not checkers and not pins and position.ep_square == NO_SQUARE:
+        return moves + legal
+
+    if checkers:
+        checker = checkers.bit_length() - 1
+        target_mask = checkers | BETWEEN[king][checker]
+    else:
+        target_mask = FULL
+    ep_square = position.ep_square
+    for move in moves:
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        if move >> 12 == EN_PASSANT:
+            captured = ep_square - 8 if color == WHITE else ep_square + 8
+            if checkers and not checkers & (1 << captured) and not target_mask & (1 << to_square):
+                continue
+            after = (occupied ^ (1 << from_square) ^ (1 << captured)) | (1 << to_square)
+            sign = -1 if color == WHITE else 1
+            queens = position.bitboards[QUEEN * sign]
+            rooks = position.bitboards[ROOK * sign] | queens
+            bishops = position.bitboards[BISHOP * sign] | queens
+            if ROOK_TABLES[king][after & ROOK_MASKS[king]] & rooks:
+                continue
+            if BISHOP_TABLES[king][after & BISHOP_MASKS[king]] & bishops:
+                continue
+            legal.append(move)
+            continue
+        if not target_mask & (1 << to_square):
+            continue
+        pin_line = pins.get(from_square)
+        if pin_line is not None and not pin_line & (1 << to_square):
+            continue
+        legal.append(move)
+    return legal
+
+
+def has_legal_moves(position: Position) -> bool:
+    return bool(generate_legal_moves(position))
+
+
+def in_check(position: Position, color: int | None = None) -> bool:
+    color = position.turn if color is None else color
+    return is_square_attacked(position, position.king_squares[color], color ^ 1)
+
+
+# generated move lists are cached by (target bitboard, origin, flag): the same few
+# target sets come back all the time, so most pieces cost one dict lookup instead of a
+# loop over their target bits. origins 0..63 are the from square of a piece, 64..71
+# stand for a set of pawns shifted by one of PAWN_DELTAS.
+MOVE_LIST_CACHE_SIZE = 1 << 18
+PAWN_DELTAS = (8, -8, 16, -16, 7, 9, -7, -9)
+PAWN_ORIGINS = {delta: 64 + i for i, delta in enumerate(PAWN_DELTAS)}
+_move_lists: dict[int, list[int]] = {}
+
+
+def _serialize(targets: int, origin: int, flag: int) -> list[int]:
+    if len(_move_lists) >= MOVE_LIST_CACHE_SIZE:
+        _move_lists.clear()
+    key = targets | (origin << 64) | (flag << 71)
+    delta = PAWN_DELTAS[origin - 64] if origin >= 64 else 0
+    moves = []
+    while targets:
+        bit = targets & -targets
+        targets ^= bit
+        to = bit.bit_length() - 1
+        from_square = to - delta if origin >= 64 else origin
+        moves.append(from_square | (to << 6) | (flag << 12))
+    _move_lists[key] = moves
+    return moves
+
+
+def _pawn_moves(moves: list[int], targets: int, delta: int, flag: int, last_rank: int):
+    """appends the moves of pawns that land on `targets` after moving `delta` squares."""
+    promotions = targets & last_rank
+    targets ^= promotions
+    if targets:
+        origin = PAWN_ORIGINS[delta]
+        key = targets | (origin << 64) | (flag << 71)
+        cached = _move_lists.get(key)
+        moves.extend(cached if cached is not None else _serialize(targets, origin, flag))
+    while promotions:
+        bit = promotions & -promotions
+        promotions ^= bit
+        to = bit.bit_length() - 1
+        promotion_flag = PROMOTION_CAPTURE if flag == CAPTURE else PROMOTION
+        for promotion in (3, 2, 1, 0):
+            moves.append((to - delta) | (to << 6) | ((promotion_flag | promotion) << 12))
+
+
+def generate_moves(
+    position: Position, color: int | None = None, sources: int = FULL, kinds: int = ALL_MOVES
+) -> list[int]:
+    """
+    generates the pseudo-legal moves of a color: moves that follow the piece rules but may
+    leave the own king in check. castling is only generated when the king does not start,
+    pass or land on an attacked square.
+
+    Args:
+        position (Position): the position to generate moves for.
+        color (int, optional): WHITE or BLACK, defaults to the side to move.
+        sources (int, optional): bitboard restricting the squares the moves start from.
+        kinds (int, optional): NOISY_MOVES, QUIET_MOVES or ALL_MOVES (the default).
+
+    Returns:
+        list[int]: moves encoded with position.encode_move.
+    """
+    color = position.turn if color is None else color
+    noisy = kinds & NOISY_MOVES
+    quiet = kinds & QUIET_MOVES
+    bitboards = position.bitboards
+    us = position.occupied_co[color]
+    them = position.occupied_co[color ^ 1]
+    occupied = us | them
+    empty = ~occupied & FULL
+    sign = 1 if color == WHITE else -1
+    moves = []
+    extend = moves.extend
+    cache_get = _move_lists.get
+
+    # pawns, generated set-wise
+    pawns = bitboards[PAWN * sign] & sources
+    if pawns:
+        last_rank = RANK_8 if color == WHITE else RANK_1
+        single, double = pawn_pushes(pawns, empty, color)
+        # pushes to the last rank are promotions, which count as noisy
+        if not quiet:
+            single &= last_rank
+        elif not noisy:
+            single &= ~last_rank
+        if color == WHITE:
+            _pawn_moves(moves, single, 8, QUIET, last_rank)
+            if quiet:
+                _pawn_moves(moves, double, 16, DOUBLE_PAWN_PUSH, last_rank)
+            if noisy:
+                _pawn_moves(moves, ((pawns & ~FILE_A) << 7) & them, 7, CAPTURE, last_rank)
+                _pawn_moves(moves, ((pawns & ~FILE_H) << 9) & them, 9, CAPTURE, last_rank)
+        else:
+            _pawn_moves(moves, single, -8, QUIET, last_rank)
+            if quiet:
+                _pawn_moves(moves, double, -16, DOUBLE_PAWN_PUSH, last_rank)
+            if noisy:
+                _pawn_moves(moves, ((pawns & ~FILE_A) >> 9) & them, -9, CAPTURE, last_rank)
+                _pawn_moves(moves, ((pawns & ~FILE_H) >> 7) & them, -7, CAPTURE, last_rank)
+        ep_square = position.ep_square
+        if ep_square != NO_SQUARE and color == position.turn and noisy:
+            bb = PAWN_ATTACKS[color ^ 1][ep_square] & pawns
+            while bb:
+                bit = bb & -bb
+                bb ^= bit
+                moves.append((bit.bit_length() - 1) | (ep_square << 6) | (EN_PASSANT << 12))
+
+    # pieces
+    for kind in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+        bb = bitboards[kind * sign] & sources
+        while bb:
+            bit = bb & -bb
+            bb ^= bit
+            square = bit.bit_length() - 1
+            if kind == KNIGHT:
+                targets = KNIGHT_ATTACKS[square]
+            elif kind == BISHOP:
+                targets = BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+            elif kind == ROOK:
+                targets = ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+            elif kind == QUEEN:
+                targets = (
+                    ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+                    | BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+                )
+            else:
+                targets = KING_ATTACKS[square]
+            captures = targets & them if noisy else 0
+            if captures:
+                key = captures | (square << 64) | (CAPTURE << 71)
+                cached = cache_get(key)
+                extend(cached if cached is not None else _serialize(captures, square, CAPTURE))
+            quiets = targets & empty if quiet else 0
+            if quiets:
+                cached = cache_get(quiets | (square << 64))
+                extend(cached if cached is not None else _serialize(quiets, square, QUIET))
+
+    # castling
+    king_from, sides = CASTLING_MOVES[color]
+    if (
+        quiet
+        and position.castling & CASTLING_RIGHTS[color]
+        and position.king_squares[color] == king_from
+        and sources & (1 << king_from)
+        and not is_square_attacked(position, king_from, color ^ 1)
+    ):
+        rooks = bitboards[ROOK * sign]
+        for rights, king_to, rook, between, (passed, landed), flag in sides:
+            if not position.castling & rights or occupied & between or not rooks & rook:
+                continue
+            if is_square_attacked(position, passed, color ^ 1):
+                continue
+            if is_square_attacked(position, landed, color ^ 1):
+                continue
+            moves.append(king_from | (king_to << 6) | (flag << 12))
+
+    return moves
@@ -0,0 +1,236 @@
+"""Standard algebraic notation (SAN) of moves, for PGN files and opening books.
+
+Example: in the starting position encode_move(6, 21) is written 'Nf3'.
+"""
+
+import re
+from bitboards import (
+    FILE_A,
+    RANK_1,
+    KNIGHT_ATTACKS,
+    KING_ATTACKS,
+    bishop_attacks,
+    rook_attacks,
+    queen_attacks,
+)
+from movegen import attackers_to, generate_legal_moves, has_legal_moves, in_check
+from position import (
+    Position,
+    WHITE,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    PIECE_SYMBOLS,
+    QUIET,
+    DOUBLE_PAWN_PUSH,
+    KING_CASTLE,
+    QUEEN_CASTLE,
+    CAPTURE,
+    PROMOTION,
+    PROMOTION_CAPTURE,
+    is_capture,
+    is_promotion,
+    promotion_piece,
+    parse_square,
+    square_name,
+)
+
+# piece letter, origin file and/or rank, 'x', destination, promotion ('=' is optional)
+SAN_PATTERN = re.compile(r"([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?")
+CASTLING_SAN = {"O-O": KING_CASTLE, "0-0": KING_CASTLE, "O-O-O": QUEEN_CASTLE, "0-0-0": QUEEN_CASTLE}
+
+
+def move_to_san(position: Position, move: int, legal_moves: list[int] | None = None) -> str:
+    """
+    the SAN of a legal move in position, with its check or mate suffix.
+
+    Args:
+        position (Position): the position before the move; left unchanged.
+        move (int): a legal move of the side to move.
+        legal_moves (list[int], optional): the legal moves of position, if already known.
+    """
+    flag = move >> 12
+    if flag == KING_CASTLE:
+        san = "O-O"
+    elif flag == QUEEN_CASTLE:
+        san = "O-O-O"
+    else:
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        kind = abs(position.squares[from_square])
+        if kind == PAWN:
+            san = square_name(from_square)[0] + "x" if is_capture(move) else ""
+            san += square_name(to_square)
+            if is_promotion(move):
+                san += "=" + PIECE_SYMBOLS[promotion_piece(move)].upper()
+        else:
+            if legal_moves is None:
+                legal_moves = generate_legal_moves(position)
+            # other pieces of the same kind that can reach the same square
+            rivals = [
+                other & 63
+                for other in legal_moves
+                if (other >> 6) & 63 == to_square
+                and other & 63 != from_square
+                and abs(position.squares[other & 63]) == kind
+            ]
+            san = PIECE_SYMBOLS[kind].upper()
+            if rivals:
+                if all(rival & 7 != from_square & 7 for rival in rivals):
+                    san += square_name(from_square)[0]
+                elif all(rival >> 3 != from_square >> 3 for rival in rivals):
+                    san += square_name(from_square)[1]
+                else:
+                    san += square_name(from_square)
+            if is_capture(move):
+                san += "x"
+            san += square_name(to_square)
+
+    position.make_move(move)
+    if in_check(position):
+        san += "+" if has_legal_moves(position) else "#"
+    position.unmake_move()
+    return san
+
+
+def _single_candidate(
+    position: Position,
+    kind: int,
+    sources: int,
+    to_square: int,
+    from_file: str | None,
+    promotion: str | None,
+) -> int | None:
+    """
+    the move of parse_san when a single piece can make it: the move is matched
+    pseudo-legally and checked with one attackers_to call on the king, instead of
+    generating the legal moves. None when that doesn't settle it (several candidates, en
+    passant, no match), and parse_san generates them.
+    """
+    us = position.turn
+    them = us ^ 1
+    to_bit = 1 << to_square
+    occupied = position.occupied
+    if position.occupied_co[us] & to_bit:
+        return None
+    target = position.occupied_co[them] & to_bit
+    if kind == PAWN:
+        forward = 8 if us == WHITE else -8
+        if to_square >> 3 == (0 if us == WHITE else 7):
+            return None
+        file_shift = "abcdefgh".index(from_file) - (to_square & 7) if from_file is not None else 0
+        if file_shift:
+            if abs(file_shift) != 1 or not target:
+                return None
+            from_square = to_square - forward + file_shift
+            flag = CAPTURE
+        elif occupied & to_bit:
+            return None
+        elif sources & (1 << (to_square - forward)):
+            from_square = to_square - forward
+            flag = QUIET
+        elif to_square >> 3 == (3 if us == WHITE else 4) and not occupied & (
+            1 << (to_square - forward)
+        ):
+            from_square = to_square - 2 * forward
+            flag = DOUBLE_PAWN_PUSH
+        else:
+            return None
+        if not sources & (1 << from_square):
+            return None
+        if to_square >> 3 in (0, 7):
+            if promotion is None:
+                return None
+            flag = (PROMOTION_CAPTURE if target else PROMOTION) | (
+                PIECE_SYMBOLS.index(promotion.lower()) - KNIGHT
+            )
+        elif promotion is not None:
+            return None
+    else:
+        if promotion is not None or not sources or sources & (sources - 1):
+            return None
+        from_square = sources.bit_length() - 1
+        flag = CAPTURE if target else QUIET
+    occupied = occupied ^ (1 << from_square) | to_bit
+    king = to_square if kind == KING else position.king_squares[us]
+    # a captured piece no longer attacks
+    if attackers_to(position, king, occupied) & position.occupied_co[them] & ~to_bit:
+        return None
+    return from_square | to_square << 6 | flag << 12
+
+
+def parse_san(position: Position, san: str) -> int:
+    """
+    the legal move san stands for. accepts the usual variants: missing or extra
+    disambiguation, '0-0' castling, promotions without '=', annotation suffixes.
+
+    Raises:
+        ValueError: san is malformed, or matches no legal move or more than one.
+    """
+    text = san.rstrip("+#!?")
+    if text in CASTLING_SAN:
+        king = 1 << position.king_squares[position.turn]
+        for move in generate_legal_moves(position, sources=king):
+            if move >> 12 == CASTLING_SAN[text]:
+                return move
+        raise ValueError(f"illegal move: {san!r}")
+
+    match = SAN_PATTERN.fullmatch(text)
+    if match is None:
+        raise ValueError(f"invalid SAN: {san!r}")
+    piece, from_file, from_rank, destination, promotion = match.groups()
+    kind = PIECE_SYMBOLS.index(piece.lower()) if piece else PAWN
+    to_square = parse_square(destination)
+    # only the pieces that could reach the destination have their moves generated
+    sources = position.pieces(kind, position.turn)
+    occupied = position.occupied_co[0] | position.occupied_co[1]
+    if kind == PAWN:
+        # pushes stay on the file; captures name the file they come from
+        if from_file is None:
+            sources &= FILE_A << (to_square & 7)
+    elif kind == KNIGHT:
+        sources &= KNIGHT_ATTACKS[to_square]
+    elif kind == BISHOP:
+        sources &= bishop_attacks(to_square, occupied)
+    elif kind == ROOK:
+        sources &= rook_attacks(to_square, occupied)
+    elif kind == QUEEN:
+        sources &= queen_attacks(to_square, occupied)
+    else:
+        sources &= KING_ATTACKS[to_square]
+    if from_file is not None:
+        sources &= FILE_A << "abcdefgh".index(from_file)
+    if from_rank is not None:
+        sources &= RANK_1 << 8 * (int(from_rank) - 1)
+
+    move = _single_candidate(position, kind, sources, to_square, from_file, promotion)
+    if move is not None:
+        return move
+    candidates = []
+    for move in generate_legal_moves(position, sources=sources) if sources else ():
+        if (move >> 6) & 63 != to_square:
+            continue
+        if is_promotion(move):
+            if promotion is None or promotion_piece(move) != PIECE_SYMBOLS.index(promotion.lower()):
+                continue
+        elif promotion is not None:
+            continue
+        # a king step of two squares is castling, only written with O-O
+        if kind == KING and move >> 12 in (KING_CASTLE, QUEEN_CASTLE):
+            continue
+        candidates.append(move)
+    if len(candidates) != 1:
+        raise ValueError(f"{'ambiguous' if candidates else 'illegal'} move: {san!r}")
+    return candidates[0]
+
+
+if __name__ == "__main__":
+    position = Position.from_fen("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    for move in generate_legal_moves(position):
+        san = move_to_san(position, move)
+        assert parse_san(position, san) == move, san
+        print(san, end=" ")
+    print()
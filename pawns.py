@@ -0,0 +1,134 @@
+"""Pawn structure evaluation and its hash table.
+
+doubled, isolated and passed pawns are found with set-wise bitboard operations, written
+so the same function works on plain ints (one position) and on NumPy uint64 arrays (a
+batch, see evaluation.evaluate_many). pawns move rarely, so within a search the result
+is looked up in a PawnHashTable keyed by Position.pawn_key instead of being recomputed.
+"""
+
+import numpy as np
+from bitboards import FULL, FILE_A, RANK_1
+
+DOUBLED_PENALTY = (10, 20)  # (midgame, endgame) per extra pawn on a file
+ISOLATED_PENALTY = (10, 15)
+# passed pawn bonus by rank counted from the pawn's own side (index 1 = starting rank)
+PASSED_BONUS_MG = (0, 5, 10, 15, 25, 40, 60, 0)
+PASSED_BONUS_EG = (0, 10, 20, 35, 60, 90, 130, 0)
+
+# complements kept positive, so they also mask NumPy uint64 arrays
+NOT_FILE_A = FULL ^ FILE_A
+
+
+def _popcount(bitboard):
+    if isinstance(bitboard, np.ndarray):
+        return np.bitwise_count(bitboard).astype(np.int64)
+    return bitboard.bit_count()
+
+
+# no augmented assignments below: on arrays they would write into the caller's array
+
+
+def _north_fill(bitboard):
+    bitboard = bitboard | ((bitboard << 8) & FULL)
+    bitboard = bitboard | ((bitboard << 16) & FULL)
+    return bitboard | ((bitboard << 32) & FULL)
+
+
+def _south_fill(bitboard):
+    bitboard = bitboard | (bitboard >> 8)
+    bitboard = bitboard | (bitboard >> 16)
+    return bitboard | (bitboard >> 32)
+
+
+def _spread(bitboard):
+    """the bitboard plus its neighbours on the adjacent files."""
+    return bitboard | ((bitboard & NOT_FILE_A) >> 1) | ((bitboard << 1) & NOT_FILE_A)
+
+
+def _files(pawns):
+    """rank 1 bitboard of the files holding at least one pawn."""
+    return _south_fill(pawns) & RANK_1
+
+
+def _side_terms(pawns, files):
+    """(midgame, endgame) penalties of one side's doubled and isolated pawns."""
+    doubled = _popcount(pawns) - _popcount(files)
+    isolated_files = files & ~(((files << 1) & NOT_FILE_A) | ((files & NOT_FILE_A) >> 1))
+    # a rank 1 bitboard times FILE_A copies it onto every rank
+    isolated = _popcount(pawns & ((isolated_files * FILE_A) & FULL))
+    return (
+        doubled * DOUBLED_PENALTY[0] + isolated * ISOLATED_PENALTY[0],
+        doubled * DOUBLED_PENALTY[1] + isolated * ISOLATED_PENALTY[1],
+    )
+
+
+def pawn_structure(white_pawns, black_pawns):
+    """
+    scores the pawn structure. works on two ints or on two uint64 arrays.
+
+    Args:
+        white_pawns: bitboard(s) of the white pawns.
+        black_pawns: bitboard(s) of the black pawns.
+
+    Returns:
+        tuple: (midgame score, endgame score, white passed pawns, black passed pawns);
+        scores from white's point of view.
+    """
+    # a pawn is passed when no enemy pawn stands ahead of it on its own or a neighbour file
+    white_passed = white_pawns & ~_spread(_south_fill(black_pawns >> 8))
+    black_passed = black_pawns & ~_spread(_north_fill((white_pawns << 8) & FULL))
+
+    white_mg, white_eg = _side_terms(white_pawns, _files(white_pawns))
+    black_mg, black_eg = _side_terms(black_pawns, _files(black_pawns))
+    mg = black_mg - white_mg
+    eg = black_eg - white_eg
+    for rank in range(1, 7):
+        white_count = _popcount(white_passed & (RANK_1 << (8 * rank)))
+        black_count = _popcount(black_passed & (RANK_1 << (8 * (7 - rank))))
+        mg = mg + (white_count - black_count) * PASSED_BONUS_MG[rank]
+        eg = eg + (white_count - black_count) * PASSED_BONUS_EG[rank]
+    return mg, eg, white_passed, black_passed
+
+
+class PawnHashTable:
+    def __init__(self, size: int = 1 << 16):
+        """
+        Args:
+            size (int, optional): number of entries, rounded down to a power of two.
+            Defaults to 65536 (see settings.PAWN_HASH_ENTRIES).
+        """
+        size = 1 << (max(size, 1).bit_length() - 1)
+        self._mask = size - 1
+        self._keys = [-1] * size
+        self._entries: list[tuple[int, int, int, int] | None] = [None] * size
+        self.probes = 0
+        self.hits = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    def reset_stats(self):
+        self.probes = self.hits = 0
+
+    def get(self, pawn_key: int, white_pawns: int, black_pawns: int) -> tuple[int, int, int, int]:
+        """
+        pawn_structure() of the pawns, from the table when their key is in it.
+
+        Args:
+            pawn_key (int): Position.pawn_key of the position the pawns come from.
+            white_pawns (int): bitboard of the white pawns.
+            black_pawns (int): bitboard of the black pawns.
+        """
+        self.probes += 1
+        index = pawn_key & self._mask
+        if self._keys[index] == pawn_key:
+            self.hits += 1
+            return self._entries[index]
+        entry = pawn_structure(white_pawns, black_pawns)
+        self._keys[index] = pawn_key
+        self._entries[index] = entry
+        return entry
+
+    def __repr__(self):
+        return f"PawnHashTable(size={len(self._keys)}, hit_rate={self.hit_rate:.1%})"
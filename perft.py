@@ -0,0 +1,230 @@
+"""Perft: counts the leaf nodes of the legal move tree to a given depth.
+
+the counts of the bundled reference positions are known, so a mismatch means a bug in
+position.py or movegen.py, and the nodes per second show speed regressions.
+
+usage:
+    python perft.py --suite [--max-depth 4] [--jobs 8]
+    python perft.py --fen "<fen>" --depth 4 [--divide] [--jobs 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from movegen import generate_legal_moves
+from position import Position, STARTING_FEN, move_to_uci
+
+# (name, fen, node counts for depth 1, 2, 3...), from the chessprogramming wiki
+REFERENCE_POSITIONS = [
+    (
+        "initial",
+        STARTING_FEN,
+        [20, 400, 8902, 197281, 4865609, 119060324],
+    ),
+    (
+        "kiwipete",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        [48, 2039, 97862, 4085603, 193690690],
+    ),
+    (
+        "position3",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        [14, 191, 2812, 43238, 674624, 11030083, 178633661],
+    ),
+    (
+        "position4",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        [6, 264, 9467, 422333, 15833292],
+    ),
+    (
+        "position4-mirrored",
+        "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+        [6, 264, 9467, 422333, 15833292],
+    ),
+    (
+        "position5",
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        [44, 1486, 62379, 2103487, 89941194],
+    ),
+    (
+        "position6",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        [46, 2079, 89890, 3894594, 164075551],
+    ),
+]
+
+
+def perft(position: Position, depth: int) -> int:
+    """number of leaf nodes of the legal move tree; the position is restored on return."""
+    moves = generate_legal_moves(position)
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move()
+    return nodes
+
+
+def divide(position: Position, depth: int) -> dict[str, int]:
+    """perft split by root move, keyed by the move in uci notation (e.g. 'e2e4')."""
+    counts = {}
+    for move in generate_legal_moves(position):
+        position.make_move(move)
+        counts[move_to_uci(move)] = perft(position, depth - 1)
+        position.unmake_move()
+    return counts
+
+
+# the root is split into at least this many subtrees per worker, so that
+# workers that finish early keep getting work
+TASKS_PER_JOB = 4
+
+
+def _perft_subtree(fen: str, path: tuple[int, ...], depth: int) -> int:
+    """worker side: rebuilds its own headless position, plays the path and counts below it."""
+    position = Position.from_fen(fen)
+    for move in path:
+        position.make_move(move)
+    return perft(position, depth)
+
+
+def _split(position: Position, depth: int, jobs: int) -> tuple[list[tuple[int, ...]], int]:
+    """
+    splits the tree into move paths, one level deeper while there are fewer than
+    TASKS_PER_JOB paths per job.
+
+    Returns:
+        tuple[list[tuple[int, ...]], int]: the paths and the depth left below each of them.
+    """
+    paths = [(move,) for move in generate_legal_moves(position)]
+    depth -= 1
+    while depth > 1 and len(paths) < jobs * TASKS_PER_JOB:
+        deeper = []
+        for path in paths:
+            for move in path:
+                position.make_move(move)
+            deeper.extend(path + (move,) for move in generate_legal_moves(position))
+            for _ in path:
+                position.unmake_move()
+        paths = deeper
+        depth -= 1
+    return paths, depth
+
+
+def parallel_divide(
+    position: Position,
+    depth: int,
+    jobs: int,
+    executor: ProcessPoolExecutor | None = None,
+) -> dict[str, int]:
+    """
+    divide() with the subtrees counted in a pool of `jobs` processes and merged by root move.
+
+    Args:
+        executor (ProcessPoolExecutor, optional): a pool to reuse across calls;
+        a pool of `jobs` workers is created (and shut down) when not given.
+    """
+    if depth < 2 or jobs < 2:
+        return divide(position, depth)
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return parallel_divide(position, depth, jobs, executor)
+
+    fen = position.fen()
+    paths, remaining_depth = _split(position, depth, jobs)
+    futures = [
+        (path[0], executor.submit(_perft_subtree, fen, path, remaining_depth))
+        for path in paths
+    ]
+    counts = {}
+    for root_move, future in futures:
+        uci = move_to_uci(root_move)
+        counts[uci] = counts.get(uci, 0) + future.result()
+    return counts
+
+
+def parallel_perft(
+    position: Position,
+    depth: int,
+    jobs: int,
+    executor: ProcessPoolExecutor | None = None,
+) -> int:
+    if depth < 2 or jobs < 2:
+        return perft(position, depth)
+    return sum(parallel_divide(position, depth, jobs, executor).values())
+
+
+def run_suite(max_depth: int, jobs: int = 1) -> bool:
+    """runs every reference position up to max_depth, printing counts and nodes per second.
+
+    Returns:
+        bool: True if every count matched.
+    """
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return _run_suite(max_depth, jobs, executor)
+    return _run_suite(max_depth, jobs, None)
+
+
+def _run_suite(max_depth: int, jobs: int, executor: ProcessPoolExecutor | None) -> bool:
+    all_passed = True
+    total_nodes = 0
+    total_seconds = 0.0
+    for name, fen, expected_counts in REFERENCE_POSITIONS:
+        position = Position.from_fen(fen)
+        for depth, expected in enumerate(expected_counts[:max_depth], start=1):
+            start = time.perf_counter()
+            nodes = parallel_perft(position, depth, jobs, executor)
+            seconds = time.perf_counter() - start
+            total_nodes += nodes
+            total_seconds += seconds
+            status = "ok" if nodes == expected else f"FAILED (expected {expected})"
+            all_passed &= nodes == expected
+            print(
+                f"{name:<20} depth {depth}: {nodes:>10} nodes "
+                f"{seconds:8.3f}s {nodes / max(seconds, 1e-9):>10.0f} nps  {status}"
+            )
+    print(f"total: {total_nodes} nodes in {total_seconds:.3f}s, {total_nodes / max(total_seconds, 1e-9):.0f} nps")
+    return all_passed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="count move generation leaf nodes")
+    parser.add_argument("--fen", default=STARTING_FEN)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--divide", action="store_true", help="print the count of every root move")
+    parser.add_argument("--suite", action="store_true", help="check the bundled reference positions")
+    parser.add_argument("--max-depth", type=int, default=4, help="deepest depth used by --suite")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="worker processes the root moves are split across (0 for one per cpu)",
+    )
+    args = parser.parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+
+    if args.suite:
+        return 0 if run_suite(args.max_depth, jobs) else 1
+
+    position = Position.from_fen(args.fen)
+    start = time.perf_counter()
+    if args.divide:
+        counts = parallel_divide(position, args.depth, jobs)
+        for uci, nodes in sorted(counts.items()):
+            print(f"{uci}: {nodes}")
+        nodes = sum(counts.values())
+    else:
+        nodes = parallel_perft(position, args.depth, jobs)
+    seconds = time.perf_counter() - start
+    print(f"nodes: {nodes}")
+    print(f"time: {seconds:.3f}s ({nodes / max(seconds, 1e-9):.0f} nps)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
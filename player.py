@@ -3,6 +3,8 @@ from abc import ABC
 import pygame
 from input_sources import AbstractInputSource
 import game_elements
+import settings
+from position import COLOR_NAMES
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -79,10 +81,15 @@ class AbstractPlayer(ABC):
         if not source_cell.piece.is_my_piece(self.color):
             return False
         if dest_cell.piece and dest_cell.piece.is_my_piece(self.color): # for castling move
-            if isinstance(dest_cell.piece, game_elements.King):
-                return True
-            return False
-
+            if not isinstance(dest_cell.piece, game_elements.King):
+                return False
+
+        if settings.USE_BITBOARD_MOVEGEN:
+            # it must be our turn and the move must be legal (no moving into check,
+            # no moving pinned pieces...)
+            if COLOR_NAMES[board.position.turn] != self.color:
+                return False
+            return board.to_position_move(player_input.move) in board.get_legal_moves(self.color)
         return True
 
     def get_input(
@@ -0,0 +1,510 @@
+"""Headless chess position.
+
+A Position knows nothing about pygame; it is the compact state the rules and the bot
+operate on, while game_elements.Board is only a view that syncs its sprites from it.
+
+squares are numbered a1=0, b1=1 ... h8=63 (square = rank * 8 + file).
+pieces are stored as signed bytes: positive for white, negative for black, 0 for empty.
+"""
+
+from array import array
+from psqt import MG_VALUES, EG_VALUES, PHASE
+from zobrist import PIECE_KEYS, CASTLING_KEYS, EP_FILE_KEYS, WHITE_TO_MOVE_KEY
+
+WHITE, BLACK = 0, 1
+COLOR_NAMES = ("white", "black")
+
+EMPTY = 0
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+PIECE_NAMES = {
+    PAWN: "pawn",
+    KNIGHT: "knight",
+    BISHOP: "bishop",
+    ROOK: "rook",
+    QUEEN: "queen",
+    KING: "king",
+}
+PIECE_SYMBOLS = " pnbrqk"
+
+# castling rights (bit flags)
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLING = 15
+
+NO_SQUARE = -1
+
+# moves are plain ints: from (6 bits) | to (6 bits) << 6 | flag (4 bits) << 12
+QUIET = 0
+DOUBLE_PAWN_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+EN_PASSANT = 5
+PROMOTION = 8  # the lowest 2 bits of a promotion flag hold the piece: knight..queen
+PROMOTION_CAPTURE = 12
+NULL_MOVE = 0
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# `castling &= CASTLING_MASK[square]` for the from and to squares of each move
+# drops the rights of a king or rook that moves or gets captured.
+CASTLING_MASK = [ALL_CASTLING] * 64
+CASTLING_MASK[0] = ALL_CASTLING & ~WHITE_QUEENSIDE
+CASTLING_MASK[4] = ALL_CASTLING & ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASK[7] = ALL_CASTLING & ~WHITE_KINGSIDE
+CASTLING_MASK[56] = ALL_CASTLING & ~BLACK_QUEENSIDE
+CASTLING_MASK[60] = ALL_CASTLING & ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASK[63] = ALL_CASTLING & ~BLACK_KINGSIDE
+
+# king from/to -> rook from/to, for the four castling moves
+CASTLING_ROOK_SQUARES = {
+    (4, 6): (7, 5),
+    (4, 2): (0, 3),
+    (60, 62): (63, 61),
+    (60, 58): (56, 59),
+}
+
+
+def make_square(file: int, rank: int) -> int:
+    return rank * 8 + file
+
+
+def square_file(square: int) -> int:
+    return square & 7
+
+
+def square_rank(square: int) -> int:
+    return square >> 3
+
+
+def square_name(square: int) -> str:
+    return "abcdefgh"[square & 7] + str((square >> 3) + 1)
+
+
+def parse_square(name: str) -> int:
+    return make_square("abcdefgh".index(name[0]), int(name[1]) - 1)
+
+
+def encode_move(from_square: int, to_square: int, flag: int = QUIET) -> int:
+    return from_square | (to_square << 6) | (flag << 12)
+
+
+def move_from(move: int) -> int:
+    return move & 63
+
+
+def move_to(move: int) -> int:
+    return (move >> 6) & 63
+
+
+def move_flag(move: int) -> int:
+    return move >> 12
+
+
+def is_capture(move: int) -> bool:
+    return bool((move >> 12) & CAPTURE)
+
+
+def is_promotion(move: int) -> bool:
+    return bool((move >> 12) & PROMOTION)
+
+
+def promotion_piece(move: int) -> int:
+    """the piece type a pawn promotes to (KNIGHT..QUEEN); only meaningful if is_promotion(move)."""
+    return ((move >> 12) & 3) + KNIGHT
+
+
+def move_to_uci(move: int) -> str:
+    """Example: encode_move(12, 28, DOUBLE_PAWN_PUSH) -> 'e2e4'"""
+    uci = square_name(move & 63) + square_name((move >> 6) & 63)
+    if is_promotion(move):
+        uci += PIECE_SYMBOLS[promotion_piece(move)]
+    return uci
+
+
+def piece_color(piece: int) -> int:
+    return WHITE if piece > 0 else BLACK
+
+
+def piece_type(piece: int) -> int:
+    return piece if piece > 0 else -piece
+
+
+class Position:
+    def __init__(self):
+        """creates an empty position with white to move; use Position.from_fen()
+        or Position.initial() for a playable one.
+        """
+        self.squares = array("b", bytes(64))
+        self.turn = WHITE
+        self.castling = 0
+        self.ep_square = NO_SQUARE
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.king_squares = [NO_SQUARE, NO_SQUARE]
+        # one bitboard per piece code, indexed by the code itself: white pieces use
+        # indexes 1..6 and the negative black codes wrap around to 7..12.
+        self.bitboards = [0] * 13
+        self.occupied_co = [0, 0]
+        # 64-bit zobrist key (see zobrist.py), kept up to date by every change to the position
+        self.key = WHITE_TO_MOVE_KEY
+        # zobrist key of the pawns alone, for the pawn structure hash table (pawns.py)
+        self.pawn_key = 0
+        # running sums of psqt.MG_VALUES, EG_VALUES and PHASE over the pieces on the board
+        # (white's point of view), kept up to date like the key
+        self.mg_score = 0
+        self.eg_score = 0
+        self.phase = 0
+        # one (move, piece on the destination square, castling, ep_square, halfmove_clock, key)
+        # record per made move
+        self.undo_stack: list[tuple[int, int, int, int, int, int]] = []
+
+    @classmethod
+    def initial(cls) -> "Position":
+        return cls.from_fen(STARTING_FEN)
+
+    @classmethod
+    def from_fen(cls, fen: str) -> "Position":
+        """
+        Args:
+            fen (str): Forsyth-Edwards notation; the clock fields are optional.
+
+        Raises:
+            ValueError: if the fen string is malformed.
+        """
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"invalid fen: {fen!r}")
+        position = cls()
+        rows = fields[0].split("/")
+        if len(rows) != 8:
+            raise ValueError(f"invalid fen: {fen!r}")
+        for i, row in enumerate(rows):
+            rank = 7 - i
+            file = 0
+            for char in row:
+                if char.isdigit():
+                    file += int(char)
+                    continue
+                kind = PIECE_SYMBOLS.find(char.lower())
+                if kind <= 0 or file > 7:
+                    raise ValueError(f"invalid fen: {fen!r}")
+                piece = kind if char.isupper() else -kind
+                position.put_piece(make_square(file, rank), piece)
+                file += 1
+            if file != 8:
+                raise ValueError(f"invalid fen: {fen!r}")
+
+        if fields[1] not in ("w", "b"):
+            raise ValueError(f"invalid fen: {fen!r}")
+        position.turn = WHITE if fields[1] == "w" else BLACK
+        castling = 0
+        for char in fields[2]:
+            if char == "-":
+                continue
+            index = "KQkq".find(char)
+            if index < 0:
+                raise ValueError(f"invalid fen: {fen!r}")
+            castling |= 1 << index
+        position.castling = castling
+        position.ep_square = NO_SQUARE if fields[3] == "-" else parse_square(fields[3])
+        if len(fields) >= 6:
+            position.halfmove_clock = int(fields[4])
+            position.fullmove_number = int(fields[5])
+        position.key = position.compute_key()
+        return position
+
+    def compute_key(self) -> int:
+        """the zobrist key computed from scratch; self.key is the same value kept incrementally."""
+        key = 0
+        for square, piece in enumerate(self.squares):
+            if piece:
+                key ^= PIECE_KEYS[piece][square]
+        key ^= CASTLING_KEYS[self.castling]
+        if self.ep_square != NO_SQUARE and self._ep_capturable():
+            key ^= EP_FILE_KEYS[self.ep_square & 7]
+        if self.turn == WHITE:
+            key ^= WHITE_TO_MOVE_KEY
+        return key
+
+    def _ep_capturable(self) -> bool:
+        """whether a pawn of the side to move stands next to the pawn that just made a double push
+        (legality does not matter); the en-passant file is only hashed then, like in Polyglot.
+        """
+        ep_square = self.ep_square
+        if self.turn == WHITE:
+            pushed, our_pawn = ep_square - 8, PAWN
+        else:
+            pushed, our_pawn = ep_square + 8, -PAWN
+        file = ep_square & 7
+        return (file > 0 and self.squares[pushed - 1] == our_pawn) or (
+            file < 7 and self.squares[pushed + 1] == our_pawn
+        )
+
+    def fen(self) -> str:
+        rows = []
+        for rank in range(7, -1, -1):
+            row = ""
+            empty = 0
+            for file in range(8):
+                piece = self.squares[make_square(file, rank)]
+                if piece == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                symbol = PIECE_SYMBOLS[piece_type(piece)]
+                row += symbol.upper() if piece > 0 else symbol
+            if empty:
+                row += str(empty)
+            rows.append(row)
+        castling = "".join(
+            char for i, char in enumerate("KQkq") if self.castling & (1 << i)
+        )
+        return " ".join(
+            [
+                "/".join(rows),
+                "wb"[self.turn],
+                castling or "-",
+                square_name(self.ep_square) if self.ep_square != NO_SQUARE else "-",
+                str(self.halfmove_clock),
+                str(self.fullmove_number),
+            ]
+        )
+
+    def copy(self) -> "Position":
+        """a full, independent copy; costs a 64-byte array copy and a few small lists."""
+        position = Position.__new__(Position)
+        position.squares = array("b", self.squares)
+        position.turn = self.turn
+        position.castling = self.castling
+        position.ep_square = self.ep_square
+        position.halfmove_clock = self.halfmove_clock
+        position.fullmove_number = self.fullmove_number
+        position.king_squares = self.king_squares.copy()
+        position.bitboards = self.bitboards.copy()
+        position.occupied_co = self.occupied_co.copy()
+        position.undo_stack = self.undo_stack.copy()
+        position.key = self.key
+        position.pawn_key = self.pawn_key
+        position.mg_score = self.mg_score
+        position.eg_score = self.eg_score
+        position.phase = self.phase
+        return position
+
+    @property
+    def occupied(self) -> int:
+        return self.occupied_co[0] | self.occupied_co[1]
+
+    def pieces(self, kind: int, color: int) -> int:
+        """bitboard of the pieces of a kind (PAWN..KING) and color."""
+        return self.bitboards[kind if color == WHITE else -kind]
+
+    def piece_at(self, square: int) -> int:
+        return self.squares[square]
+
+    def put_piece(self, square: int, piece: int):
+        """put a piece on an empty square."""
+        self.squares[square] = piece
+        bit = 1 << square
+        self.bitboards[piece] |= bit
+        self.occupied_co[WHITE if piece > 0 else BLACK] |= bit
+        self.key ^= PIECE_KEYS[piece][square]
+        if piece == PAWN or piece == -PAWN:
+            self.pawn_key ^= PIECE_KEYS[piece][square]
+        self.mg_score += MG_VALUES[piece][square]
+        self.eg_score += EG_VALUES[piece][square]
+        self.phase += PHASE[piece]
+        if piece == KING:
+            self.king_squares[WHITE] = square
+        elif piece == -KING:
+            self.king_squares[BLACK] = square
+
+    def remove_piece(self, square: int) -> int:
+        """remove and return the piece on the square (EMPTY if there was none)."""
+        piece = self.squares[square]
+        if piece != EMPTY:
+            self.squares[square] = EMPTY
+            bit = ~(1 << square)
+            self.bitboards[piece] &= bit
+            self.occupied_co[WHITE if piece > 0 else BLACK] &= bit
+            self.key ^= PIECE_KEYS[piece][square]
+            if piece == PAWN or piece == -PAWN:
+                self.pawn_key ^= PIECE_KEYS[piece][square]
+            self.mg_score -= MG_VALUES[piece][square]
+            self.eg_score -= EG_VALUES[piece][square]
+            self.phase -= PHASE[piece]
+        return piece
+
+    def move_piece(self, from_square: int, to_square: int):
+        """move a piece to an empty square."""
+        piece = self.remove_piece(from_square)
+        self.put_piece(to_square, piece)
+
+    def infer_move(self, from_square: int, to_square: int, promotion: int = QUEEN) -> int:
+        """builds a move from its two squares, deriving the flags from the position;
+        a king moving two files is castling. the move is not validated.
+        """
+        piece = self.squares[from_square]
+        kind = piece_type(piece)
+        captured = self.squares[to_square] != EMPTY
+        if kind == KING and abs(to_square - from_square) == 2:
+            flag = KING_CASTLE if to_square > from_square else QUEEN_CASTLE
+        elif kind == PAWN and to_square == self.ep_square:
+            flag = EN_PASSANT
+        elif kind == PAWN and abs(to_square - from_square) == 16:
+            flag = DOUBLE_PAWN_PUSH
+        else:
+            flag = CAPTURE if captured else QUIET
+        if kind == PAWN and square_rank(to_square) in (0, 7):
+            flag = (PROMOTION_CAPTURE if captured else PROMOTION) | (promotion - KNIGHT)
+        return encode_move(from_square, to_square, flag)
+
+    def make_move(self, move: int):
+        """
+        applies a move to the position and pushes an undo record so that
+        unmake_move() can take it back. the move is not validated.
+        """
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        flag = move >> 12
+        piece = self.squares[from_square]
+        ep_square = self.ep_square
+        self.undo_stack.append(
+            (move, self.squares[to_square], self.castling, ep_square, self.halfmove_clock, self.key)
+        )
+
+        # the en-passant file is hashed depending on the pawns around it, drop it before they move
+        if ep_square != NO_SQUARE:
+            if self._ep_capturable():
+                self.key ^= EP_FILE_KEYS[ep_square & 7]
+            self.ep_square = NO_SQUARE
+
+        if flag == EN_PASSANT:
+            self.remove_piece(to_square - 8 if piece > 0 else to_square + 8)
+        elif flag & CAPTURE:
+            self.remove_piece(to_square)
+
+        self.halfmove_clock += 1
+        if flag & CAPTURE or piece == PAWN or piece == -PAWN:
+            self.halfmove_clock = 0
+
+        self.move_piece(from_square, to_square)
+
+        if flag & PROMOTION:
+            self.remove_piece(to_square)
+            kind = (flag & 3) + KNIGHT
+            self.put_piece(to_square, kind if piece > 0 else -kind)
+        elif flag == KING_CASTLE or flag == QUEEN_CASTLE:
+            rook_from, rook_to = CASTLING_ROOK_SQUARES[(from_square, to_square)]
+            self.move_piece(rook_from, rook_to)
+
+        castling = self.castling & CASTLING_MASK[from_square] & CASTLING_MASK[to_square]
+        if castling != self.castling:
+            self.key ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[castling]
+            self.castling = castling
+        if self.turn == BLACK:
+            self.fullmove_number += 1
+        self.turn ^= 1
+        self.key ^= WHITE_TO_MOVE_KEY
+
+        if flag == DOUBLE_PAWN_PUSH:
+            self.ep_square = (from_square + to_square) // 2
+            if self._ep_capturable():
+                self.key ^= EP_FILE_KEYS[self.ep_square & 7]
+
+    def unmake_move(self) -> int:
+        """
+        takes back the last move made with make_move() and returns it.
+
+        Raises:
+            IndexError: if there is no move to take back.
+        """
+        move, captured, castling, ep_square, halfmove_clock, key = self.undo_stack.pop()
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        flag = move >> 12
+
+        self.turn ^= 1
+        if self.turn == BLACK:
+            self.fullmove_number -= 1
+
+        if flag & PROMOTION:
+            self.remove_piece(to_square)
+            self.put_piece(from_square, PAWN if self.turn == WHITE else -PAWN)
+        else:
+            self.move_piece(to_square, from_square)
+            if flag == KING_CASTLE or flag == QUEEN_CASTLE:
+                rook_from, rook_to = CASTLING_ROOK_SQUARES[(from_square, to_square)]
+                self.move_piece(rook_to, rook_from)
+
+        if flag == EN_PASSANT:
+            if self.turn == WHITE:
+                self.put_piece(to_square - 8, -PAWN)
+            else:
+                self.put_piece(to_square + 8, PAWN)
+        elif captured:
+            self.put_piece(to_square, captured)
+
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.key = key
+        return move
+
+    def make_null_move(self):
+        """
+        passes the turn without moving, for null-move pruning; take it back with
+        unmake_null_move(). the halfmove clock restarts so repetition_count() doesn't look
+        past the null move.
+        """
+        self.undo_stack.append(
+            (NULL_MOVE, 0, self.castling, self.ep_square, self.halfmove_clock, self.key)
+        )
+        if self.ep_square != NO_SQUARE:
+            if self._ep_capturable():
+                self.key ^= EP_FILE_KEYS[self.ep_square & 7]
+            self.ep_square = NO_SQUARE
+        self.halfmove_clock = 0
+        self.turn ^= 1
+        self.key ^= WHITE_TO_MOVE_KEY
+
+    def unmake_null_move(self):
+        _, _, _, ep_square, halfmove_clock, key = self.undo_stack.pop()
+        self.turn ^= 1
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.key = key
+
+    def repetition_count(self) -> int:
+        """how many times the current position occurred before, since the last capture or pawn move."""
+        key = self.key
+        undo_stack = self.undo_stack
+        count = 0
+        # record i holds the key before move i; the same side is to move every second ply
+        oldest = max(len(undo_stack) - self.halfmove_clock, 0)
+        for i in range(len(undo_stack) - 2, oldest - 1, -2):
+            if undo_stack[i][5] == key:
+                count += 1
+        return count
+
+    @property
+    def last_move(self) -> int | None:
+        return self.undo_stack[-1][0] if self.undo_stack else None
+
+    def __str__(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row = []
+            for file in range(8):
+                piece = self.squares[make_square(file, rank)]
+                symbol = PIECE_SYMBOLS[piece_type(piece)] if piece else "."
+                row.append(symbol.upper() if piece > 0 else symbol)
+            rows.append(" ".join(row))
+        return "\n".join(rows)
+
+    def __repr__(self):
+        return f"Position(fen={self.fen()!r})"
@@ -0,0 +1,238 @@
+"""Position index over a game archive: which games reached a position, and what came next.
+
+every position of every archived game is a posting (key, game, ply, move): its
+Position.key, the game number in the archive, the ply it was reached at and the move
+played from it (0 after the last move). postings live in segments, NumPy arrays sorted by
+key and saved as .npy files, opened with np.load(mmap_mode="r"); a lookup is a binary
+search (np.searchsorted) in each segment, nothing is replayed.
+
+the index grows with the archive: update() indexes the games appended since the last
+update into a new segment, then merges the newest segments while the last is at least
+half the size of the one before, so there are only logarithmically many segments and each
+posting is rewritten a logarithmic number of times. each segment also keeps the results of
+its games, for the explorer statistics.
+
+usage:
+    python position_index.py update games.arc [--max-ply 40]
+    python position_index.py explore games.arc [fen]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+import numpy as np
+from archive import GameArchive, RESULTS
+from notation import move_to_san
+from position import Position
+
+POSTING_DTYPE = np.dtype([("key", "<u8"), ("game", "<u4"), ("ply", "<u2"), ("move", "<u2")])
+SEGMENT_PATTERN = re.compile(r"(\d+)-(\d+)\.postings\.npy")
+WHITE_WINS, BLACK_WINS, DRAWS = RESULTS.index("1-0"), RESULTS.index("0-1"), RESULTS.index("1/2-1/2")
+
+
+class Segment:
+    def __init__(self, directory: str, first_game: int, end_game: int):
+        """the postings of games first_game..end_game - 1, memory-mapped."""
+        self.first_game = first_game
+        self.end_game = end_game
+        stem = os.path.join(directory, f"{first_game:010d}-{end_game:010d}")
+        self.postings_path = stem + ".postings.npy"
+        self.results_path = stem + ".results.npy"
+        self.postings = np.load(self.postings_path, mmap_mode="r")
+        # RESULTS index of each game of the segment
+        self.results = np.load(self.results_path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.postings)
+
+    def lookup(self, key: int) -> np.ndarray:
+        keys = self.postings["key"]
+        start = np.searchsorted(keys, np.uint64(key), "left")
+        end = np.searchsorted(keys, np.uint64(key), "right")
+        return self.postings[start:end]
+
+    def delete(self):
+        del self.postings, self.results
+        os.remove(self.postings_path)
+        os.remove(self.results_path)
+
+
+def _save(path: str, array: np.ndarray):
+    """writes the .npy under a temporary name first, so readers never see half a file."""
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        np.save(file, array)
+    os.replace(temporary, path)
+
+
+def game_postings(moves: np.ndarray, game: int, start_position: Position, max_ply: int | None) -> np.ndarray:
+    """the postings of one game: the position before each move, and the final one."""
+    plies = len(moves) if max_ply is None else min(len(moves), max_ply)
+    postings = np.zeros(plies + 1, dtype=POSTING_DTYPE)
+    position = start_position
+    keys = postings["key"]
+    move_list = moves.tolist()
+    for ply in range(plies):
+        keys[ply] = position.key
+        position.make_move(move_list[ply])
+    keys[plies] = position.key
+    postings["game"] = game
+    postings["ply"] = np.arange(plies + 1)
+    postings["move"][:plies] = moves[:plies]
+    if plies < len(moves):
+        postings["move"][plies] = moves[plies]
+    return postings
+
+
+class PositionIndex:
+    def __init__(self, directory: str):
+        """opens (or starts) the index kept in directory."""
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        ranges = []
+        for name in os.listdir(directory):
+            match = SEGMENT_PATTERN.fullmatch(name)
+            if match:
+                ranges.append((int(match.group(1)), int(match.group(2))))
+        self.segments: list[Segment] = []
+        # widest first, so a merge interrupted before deleting its inputs leaves them out
+        for first_game, end_game in sorted(ranges, key=lambda games: (games[0], -games[1])):
+            segment = Segment(directory, first_game, end_game)
+            if self.segments and first_game < self.segments[-1].end_game:
+                segment.delete()
+            else:
+                self.segments.append(segment)
+
+    @property
+    def games_indexed(self) -> int:
+        return self.segments[-1].end_game if self.segments else 0
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def _write_segment(self, first_game: int, end_game: int, postings: np.ndarray, results: np.ndarray) -> Segment:
+        stem = os.path.join(self.directory, f"{first_game:010d}-{end_game:010d}")
+        # results first: a segment exists once its postings file does
+        _save(stem + ".results.npy", results)
+        _save(stem + ".postings.npy", postings)
+        return Segment(self.directory, first_game, end_game)
+
+    def update(self, archive: GameArchive, max_ply: int | None = None) -> int:
+        """
+        indexes the archive's games added since the last update.
+
+        Args:
+            archive (GameArchive): the archive the index belongs to.
+            max_ply (int, optional): index only the positions up to this ply of each game
+            (an opening explorer needs no more); all of them if None.
+
+        Returns:
+            int: the number of games indexed.
+        """
+        first_game = self.games_indexed
+        end_game = len(archive)
+        if end_game <= first_game:
+            return 0
+        chunks = []
+        results = np.zeros(end_game - first_game, dtype=np.uint8)
+        for number in range(first_game, end_game):
+            game = archive[number]
+            chunks.append(game_postings(game.moves, number, game.start_position(), max_ply))
+            results[number - first_game] = RESULTS.index(game.result)
+        postings = np.concatenate(chunks)
+        # stable, so the postings of a key stay in game and ply order
+        postings = postings[np.argsort(postings["key"], kind="stable")]
+        self.segments.append(self._write_segment(first_game, end_game, postings, results))
+        self._merge()
+        return end_game - first_game
+
+    def _merge(self):
+        while len(self.segments) >= 2 and len(self.segments[-1]) * 2 >= len(self.segments[-2]):
+            older, newer = self.segments[-2], self.segments[-1]
+            postings = np.concatenate([older.postings, newer.postings])
+            postings = postings[np.argsort(postings["key"], kind="stable")]
+            results = np.concatenate([older.results, newer.results])
+            merged = self._write_segment(older.first_game, newer.end_game, postings, results)
+            older.delete()
+            newer.delete()
+            self.segments[-2:] = [merged]
+
+    def lookup(self, key: int) -> np.ndarray:
+        """every posting of a position key, in game order."""
+        found = [segment.lookup(key) for segment in self.segments]
+        return np.concatenate(found) if found else np.zeros(0, dtype=POSTING_DTYPE)
+
+    def games(self, position: Position) -> list[tuple[int, int]]:
+        """(game number, ply) of every time an indexed game reached position."""
+        postings = self.lookup(position.key)
+        return list(zip(postings["game"].tolist(), postings["ply"].tolist()))
+
+    def explore(self, position: Position) -> list[tuple[int, int, int, int, int]]:
+        """
+        what was played from position.
+
+        Returns:
+            list[tuple[int, int, int, int, int]]: (move, games, white wins, draws, black
+            wins) per move, most played first; move 0 counts the games that ended there.
+        """
+        stats: dict[int, list[int]] = {}
+        for segment in self.segments:
+            postings = segment.lookup(position.key)
+            if not len(postings):
+                continue
+            results = segment.results[postings["game"] - segment.first_game]
+            for move in np.unique(postings["move"]).tolist():
+                played = results[postings["move"] == move]
+                entry = stats.setdefault(move, [0, 0, 0, 0])
+                entry[0] += len(played)
+                entry[1] += int(np.count_nonzero(played == WHITE_WINS))
+                entry[2] += int(np.count_nonzero(played == DRAWS))
+                entry[3] += int(np.count_nonzero(played == BLACK_WINS))
+        return sorted(((move, *entry) for move, entry in stats.items()), key=lambda row: (-row[1], row[0]))
+
+    def __repr__(self):
+        return (
+            f"PositionIndex({self.directory!r}, games={self.games_indexed}, "
+            f"postings={len(self)}, segments={len(self.segments)})"
+        )
+
+
+def index_directory(archive_path: str) -> str:
+    """where the index of an archive is kept by default."""
+    return archive_path + ".positions"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="position index of a game archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update = commands.add_parser("update", help="index the games added to the archive")
+    update.add_argument("archive")
+    update.add_argument("--max-ply", type=int, default=None)
+    explore = commands.add_parser("explore", help="list the moves played from a position")
+    explore.add_argument("archive")
+    explore.add_argument("fen", nargs="?")
+    args = parser.parse_args(argv)
+
+    index = PositionIndex(index_directory(args.archive))
+    if args.command == "update":
+        start = time.perf_counter()
+        with GameArchive(args.archive) as archive:
+            count = index.update(archive, args.max_ply)
+        print(f"indexed {count} games in {time.perf_counter() - start:.2f}s: {index}")
+        return 0
+
+    position = Position.from_fen(args.fen) if args.fen else Position.initial()
+    start = time.perf_counter()
+    rows = index.explore(position)
+    milliseconds = (time.perf_counter() - start) * 1000
+    for move, games, white_wins, draws, black_wins in rows:
+        name = move_to_san(position, move) if move else "(end)"
+        print(f"{name:<8} {games:>8} games  +{white_wins} ={draws} -{black_wins}")
+    print(f"{sum(row[1] for row in rows)} games in {milliseconds:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
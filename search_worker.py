@@ -0,0 +1,281 @@
+"""Runs engine.Engine in separate processes so the bot thinks without blocking the frames.
+
+the render loop hands a position to SearchWorker.start() and polls SearchWorker.poll()
+once per frame; it never waits on the search. the engines (and their transposition
+table) live in the worker processes for the whole game, so they stay warm between moves.
+
+with more than one worker the search is lazy SMP: every process searches the same
+position, all of them reading and writing one transposition table in shared memory, and
+the helpers search odd ones one ply deeper than the main worker so they fill the table
+ahead of it. only the main worker's result is reported; the helpers stop when it's done.
+
+ponder() searches the position after the move the opponent is expected to play, without
+a time limit. if the opponent plays it, ponderhit() turns that search into the real one
+by handing the workers its time budget through shared memory, so nothing is restarted.
+"""
+
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from engine import Engine, SearchResult
+from pawns import PawnHashTable
+from position import Position
+from tablebase import Tablebases
+from time_manager import TimeManager
+from transposition import TranspositionTable, table_nbytes
+
+
+def _worker_main(
+    connection: Connection,
+    cancelled,
+    finished,
+    ponderhit,
+    worker_id: int,
+    max_depth: int,
+    time_limit: float | None,
+    table_mb: float,
+    shared_table: SharedMemory | None,
+    tablebase_dir: str | None,
+    pawn_hash_entries: int,
+):
+    """
+    a worker process: receives (search id, position, time manager) requests until it
+    receives None.
+    the main worker (id 0) sends back (search id, SearchResult, statistics line) and marks
+    the search finished, the helpers only search. ponderhit holds (search id, soft limit,
+    hard limit), a limit of -1 meaning none.
+    """
+    buffer = shared_table.buf if shared_table is not None else None
+    # the tables are memory-mapped, every worker shares their pages
+    tablebases = Tablebases(tablebase_dir) if tablebase_dir else None
+    engine = Engine(
+        max_depth,
+        time_limit,
+        TranspositionTable(table_mb, buffer),
+        tablebases=tablebases,
+        pawn_table=PawnHashTable(pawn_hash_entries),
+    )
+    while True:
+        try:
+            request = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        search_id, position, time_manager = request
+        if cancelled.value >= search_id:
+            continue
+
+        def cancelled_or_ponderhit(search_id=search_id, time_manager=time_manager):
+            # read with the clock, every check_interval nodes
+            if time_manager is not None and time_manager.pondering and ponderhit[0] == search_id:
+                time_manager.ponderhit(
+                    ponderhit[1] if ponderhit[1] >= 0 else None,
+                    ponderhit[2] if ponderhit[2] >= 0 else None,
+                )
+            return cancelled.value >= search_id
+
+        if worker_id == 0:
+            result = engine.search(
+                position,
+                should_stop=cancelled_or_ponderhit,
+                time_manager=time_manager,
+            )
+            finished.value = search_id
+            stats = (
+                f"{engine.table} {engine.pawn_table} "
+                f"first-move cutoffs {engine.cutoff_rates()} "
+                f"tablebase hits {engine.tablebase_hits}"
+            )
+            connection.send((search_id, result, stats))
+        else:
+            engine.search(
+                position,
+                should_stop=lambda: cancelled_or_ponderhit() or finished.value >= search_id,
+                depth_offset=worker_id % 2,
+                time_manager=time_manager,
+            )
+
+
+class SearchWorker:
+    def __init__(
+        self,
+        max_depth: int = 6,
+        time_limit: float | None = 1.0,
+        table_mb: float = 16,
+        workers: int = 1,
+        tablebase_dir: str | None = None,
+        pawn_hash_entries: int = 1 << 16,
+    ):
+        """
+        the worker processes are started by the first search.
+
+        Args:
+            max_depth (int, optional): passed to the workers' Engine. Defaults to 6.
+            time_limit (float | None, optional): passed to the workers' Engine. Defaults to 1.0.
+            table_mb (float, optional): size of the transposition table. Defaults to 16.
+            workers (int, optional): number of search processes; more than one shares the
+            table through shared memory. Defaults to 1.
+            tablebase_dir (str, optional): where the workers' engines find the endgame
+            tablebases; None for none.
+            pawn_hash_entries (int, optional): size of each worker's pawn hash table.
+            Defaults to 65536.
+        """
+        self.max_depth = max_depth
+        self.time_limit = time_limit
+        self.table_mb = table_mb
+        self.workers = max(1, workers)
+        self.tablebase_dir = tablebase_dir
+        self.pawn_hash_entries = pawn_hash_entries
+        self._processes: list[multiprocessing.Process] = []
+        # one request pipe per process; results only come back on the main worker's
+        self._connections: list[Connection] = []
+        self._shared_table: SharedMemory | None = None
+        # every search before and including this id is cancelled; shared with the workers
+        self._cancelled = multiprocessing.RawValue("q", 0)
+        # the last search id the main worker finished; tells the helpers to stop
+        self._finished = multiprocessing.RawValue("q", 0)
+        # (search id, soft limit ns, hard limit ns) of the last ponder hit
+        self._ponderhit = multiprocessing.RawArray("q", 3)
+        self._last_id = 0
+        # id of the search whose result we are waiting for
+        self._pending_id: int | None = None
+        # whether that search is a ponder search not yet hit
+        self.pondering = False
+        # the main worker's table and move ordering statistics after the last search
+        self.search_stats = ""
+
+    @property
+    def is_searching(self) -> bool:
+        return self._pending_id is not None
+
+    def _ensure_started(self):
+        if self._processes and all(process.is_alive() for process in self._processes):
+            return
+        self._stop_processes()
+        if self.workers > 1:
+            self._shared_table = SharedMemory(create=True, size=table_nbytes(self.table_mb))
+        for worker_id in range(self.workers):
+            connection, child_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker_main,
+                args=(
+                    child_connection,
+                    self._cancelled,
+                    self._finished,
+                    self._ponderhit,
+                    worker_id,
+                    self.max_depth,
+                    self.time_limit,
+                    self.table_mb,
+                    self._shared_table,
+                    self.tablebase_dir,
+                    self.pawn_hash_entries,
+                ),
+                daemon=True,
+            )
+            process.start()
+            child_connection.close()
+            self._processes.append(process)
+            self._connections.append(connection)
+
+    def start(self, position: Position, time_manager: TimeManager | None = None):
+        """
+        starts searching a copy of the position, cancelling the search in progress if any.
+
+        Args:
+            position (Position): the position to search, for its side to move.
+            time_manager (TimeManager, optional): limits for this search; the engine's
+            time_limit if None.
+        """
+        self.cancel()
+        self._ensure_started()
+        self.pondering = False
+        self._last_id += 1
+        self._pending_id = self._last_id
+        request = (self._pending_id, position.copy(), time_manager)
+        for connection in self._connections:
+            connection.send(request)
+
+    def ponder(self, position: Position):
+        """
+        starts searching a copy of the position without a time limit, until ponderhit() or
+        cancel(); its result is still returned by poll() if it finishes first.
+
+        Args:
+            position (Position): the position after the opponent's expected move.
+        """
+        self.start(position, TimeManager.ponder())
+        self.pondering = True
+
+    def ponderhit(self, time_manager: TimeManager):
+        """
+        the expected move was played: the ponder search goes on as the real search, with
+        time_manager's limits counted from now.
+        """
+        if not self.pondering:
+            return
+        ponderhit = self._ponderhit
+        ponderhit[1] = time_manager.soft_limit_ns if time_manager.soft_limit_ns is not None else -1
+        ponderhit[2] = time_manager.hard_limit_ns if time_manager.hard_limit_ns is not None else -1
+        # the id goes last, the workers read the limits once they see it
+        ponderhit[0] = self._pending_id
+        self.pondering = False
+
+    def poll(self) -> SearchResult | None:
+        """
+        returns without waiting.
+
+        Returns:
+            SearchResult | None: the main worker's result of the search started last, None
+            while it is still running (or if no search was started).
+        """
+        if self._pending_id is None:
+            return None
+        connection = self._connections[0]
+        while connection.poll():
+            try:
+                search_id, result, self.search_stats = connection.recv()
+            except EOFError:
+                logging.error("search worker exited unexpectedly")
+                self._pending_id = None
+                return None
+            # results of cancelled searches may still arrive; they are dropped here
+            if search_id == self._pending_id:
+                self._pending_id = None
+                self.pondering = False
+                return result
+        return None
+
+    def cancel(self):
+        """stops the search in progress; its result will never be returned by poll()."""
+        if self._pending_id is None:
+            return
+        self._cancelled.value = self._pending_id
+        self._pending_id = None
+        self.pondering = False
+
+    def _stop_processes(self):
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        for connection in self._connections:
+            connection.close()
+        self._processes.clear()
+        self._connections.clear()
+        if self._shared_table is not None:
+            self._shared_table.close()
+            self._shared_table.unlink()
+            self._shared_table = None
+
+    def close(self):
+        """cancels any search and stops the worker processes."""
+        self.cancel()
+        self._stop_processes()
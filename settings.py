@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 import logging
+import pygame
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -17,6 +18,42 @@ TEXTURE_DIR = BASE_DIR / "textures/"
 DEFAULT_TEXTURE_PACK = "pack1"
 AVAILABLE_SPOTS_COLOR = "yellow"
 LAST_MOVE_CELL_COLOR = "darkgreen"
+# generate moves from the board's position with bitboards (movegen.py) instead of
+# walking the cells in each piece's calculate_moves
+USE_BITBOARD_MOVEGEN = True
+UNDO_KEY = pygame.K_BACKSPACE
+# Bot: deepest iteration of the engine's search and seconds it may think per move
+BOT_SEARCH_DEPTH = 6
+BOT_THINK_TIME = 1.0
+# the Bot holds back its move until this many seconds after its turn started
+BOT_MIN_MOVE_TIME = 1.0
+# memory for the Bot's transposition table
+TRANSPOSITION_TABLE_MB = 64
+# entries of each search process's pawn structure cache (pawns.PawnHashTable); past
+# 65536 a search only misses structures it meets for the first time
+PAWN_HASH_ENTRIES = 1 << 16
+# processes searching for the Bot at once (lazy SMP); up to the number of cores
+BOT_SEARCH_WORKERS = 1
+# keep searching on the opponent's time, from the reply the bot expects
+BOT_PONDER = True
+# Polyglot opening book the bot plays from (build one with `python book.py build`);
+# ignored when the file doesn't exist
+BOOK_PATH = "book.bin"
+# KQK, KRK and KPK tables (generate them with `python tablebase.py generate`)
+TABLEBASE_DIR = "tablebases"
+# every game is recorded into its own PGN file in this directory; None records nothing
+PGN_DIR = "games"
+# seconds between two fsyncs of the game file (every move is written as it's played)
+PGN_FSYNC_SECONDS = 5.0
+# finished games are also appended to this binary archive (see archive.py); None to skip
+ARCHIVE_PATH = "games/games.arc"
+# index the archived games by position (see position_index.py), so EXPLORER_KEY can list
+# what was played from the board's position before
+INDEX_POSITIONS = True
+EXPLORER_KEY = pygame.K_e
+# game clock: minutes per player and seconds added after each move; None plays untimed
+CLOCK_MINUTES = None
+CLOCK_INCREMENT_SECONDS = 0
 
 BOARD_WIDTH_HIGHT = (HIGHT, HIGHT)
 # divide BOARD_WIDTH_HIGHT by 8 because a board in a chess game has 8 cells
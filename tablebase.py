@@ -0,0 +1,409 @@
+"""Endgame tablebases for king and one piece against a king: KQK, KRK and KPK.
+
+the tables are generated here by retrograde analysis, with nothing but NumPy: every
+position of the material is enumerated with its legal moves once, then solved backwards
+from the checkmates, one ply at a time. a position where the side to move can reach a
+position lost for the opponent in n - 1 plies is won in n; one where every move reaches a
+position won for the opponent is lost in one more ply than the slowest of them. what is
+never solved is a draw.
+
+a table is an int8 array of shape (2, 64, 64, 64) saved as <name>.npy, indexed by
+[side to move, strong king, weak king, piece square] (side 0 = the side with the piece,
+squares as in position.py, the strong side playing up the board). a value is
+    0          draw
+    n + 1      the side to move mates in n plies
+    -(n + 1)   the side to move is mated in n plies
+    ILLEGAL    not a legal position
+positions where the piece belongs to black are probed colour-flipped. the files are
+opened with np.load(mmap_mode="r"), a np.memmap: the pages are read on demand and
+shared by every search process through the page cache.
+
+usage:
+    python tablebase.py generate [--dir tablebases]
+    python tablebase.py probe [--dir tablebases] fen
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+import numpy as np
+from movegen import generate_legal_moves
+from position import (
+    Position,
+    WHITE,
+    BLACK,
+    PAWN,
+    KNIGHT,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    move_to_uci,
+)
+
+DRAW = 0
+ILLEGAL = -128
+TABLE_SHAPE = (2, 64, 64, 64)
+# generation order: KPK promotes into the other two
+TABLE_PIECES = {"KQK": QUEEN, "KRK": ROOK, "KPK": PAWN}
+PIECE_TABLES = {piece: name for name, piece in TABLE_PIECES.items()}
+
+_SQUARES = np.arange(64)
+_FILES = _SQUARES & 7
+_RANKS = _SQUARES >> 3
+# [a, b]: a and b are a king step apart or the same square
+_NEAR = (np.abs(_FILES[:, None] - _FILES[None, :]) <= 1) & (np.abs(_RANKS[:, None] - _RANKS[None, :]) <= 1)
+_KING_OFFSETS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+_ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+_BISHOP_DIRECTIONS = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def _king_steps() -> np.ndarray:
+    """[square, direction] -> the square a king step away, -1 off the board."""
+    steps = np.full((64, 8), -1, dtype=np.int64)
+    for square in range(64):
+        for direction, (file_step, rank_step) in enumerate(_KING_OFFSETS):
+            file, rank = (square & 7) + file_step, (square >> 3) + rank_step
+            if 0 <= file < 8 and 0 <= rank < 8:
+                steps[square, direction] = rank * 8 + file
+    return steps
+
+
+def _lines(directions) -> tuple[np.ndarray, np.ndarray]:
+    """
+    slider geometry: aligned[a, b] when b is on one of a's rays, between[a, b, c] when c
+    lies strictly between a and b on that ray.
+    """
+    aligned = np.zeros((64, 64), dtype=bool)
+    between = np.zeros((64, 64, 64), dtype=bool)
+    for square in range(64):
+        for file_step, rank_step in directions:
+            passed = []
+            file, rank = (square & 7) + file_step, (square >> 3) + rank_step
+            while 0 <= file < 8 and 0 <= rank < 8:
+                target = rank * 8 + file
+                aligned[square, target] = True
+                between[square, target, passed] = True
+                passed.append(target)
+                file, rank = file + file_step, rank + rank_step
+    return aligned, between
+
+
+def _pawn_attacks() -> np.ndarray:
+    """[pawn, square] -> a white pawn on pawn attacks square."""
+    attacks = np.zeros((64, 64), dtype=bool)
+    for square in range(56):
+        if square & 7 > 0:
+            attacks[square, square + 7] = True
+        if square & 7 < 7:
+            attacks[square, square + 9] = True
+    return attacks
+
+
+_KING_STEPS = _king_steps()
+
+
+def _geometry(piece: int) -> tuple[np.ndarray, np.ndarray]:
+    """(aligned, between) of a queen or rook, see _lines."""
+    if piece == ROOK:
+        return _lines(_ROOK_DIRECTIONS)
+    rook_aligned, rook_between = _lines(_ROOK_DIRECTIONS)
+    bishop_aligned, bishop_between = _lines(_BISHOP_DIRECTIONS)
+    return rook_aligned | bishop_aligned, rook_between | bishop_between
+
+
+def generate_table(piece: int, promotions: dict[int, np.ndarray] | None = None) -> np.ndarray:
+    """
+    solves king and piece against king.
+
+    Args:
+        piece (int): QUEEN, ROOK or PAWN.
+        promotions (dict[int, np.ndarray], optional): for PAWN, the finished tables of the
+        pieces it may promote to (QUEEN, ROOK); other promotions count as draws.
+
+    Returns:
+        np.ndarray: the int8 table, see the module docstring.
+    """
+    promotions = promotions or {}
+    index = np.arange(64**3)
+    strong_king, weak_king, square = index >> 12, (index >> 6) & 63, index & 63
+    count = len(index)
+
+    if piece == PAWN:
+        attacks = _pawn_attacks()
+        # the king never blocks a pawn's capture
+        def attacked(target, blocker):
+            return attacks[square, target]
+    else:
+        aligned, between = _geometry(piece)
+
+        def attacked(target, blocker):
+            return aligned[square, target] & ~between[square, target, blocker]
+
+    legal = (
+        (strong_king != weak_king)
+        & (strong_king != square)
+        & (weak_king != square)
+        & ~_NEAR[strong_king, weak_king]
+    )
+    if piece == PAWN:
+        legal &= (square >= 8) & (square < 56)
+    weak_in_check = legal & attacked(weak_king, strong_king)
+    # the weak side can't be in check with the strong side to move
+    legal_strong = legal & ~weak_in_check
+    legal_weak = legal
+
+    # strong side to move: edges into weak-to-move positions; sources of the weak side's
+    # moves into strong-to-move positions. the last two entries of the weak-to-move
+    # values are an extra draw and, for promotions, the promoted tables' values follow.
+    strong_sources, strong_targets = [], []
+    extra_values = [np.array([DRAW], dtype=np.int16)]
+    extra_offset = count + 1
+
+    def add(sources, targets):
+        strong_sources.append(sources)
+        strong_targets.append(targets)
+
+    for direction in range(8):
+        to = _KING_STEPS[strong_king, direction]
+        ok = legal_strong & (to >= 0)
+        to = np.where(ok, to, 0)
+        ok &= (to != square) & ~_NEAR[to, weak_king]
+        add(index[ok], (to[ok] << 12) | (weak_king[ok] << 6) | square[ok])
+
+    if piece == PAWN:
+        push = np.minimum(square + 8, 63)
+        ok = legal_strong & (push != strong_king) & (push != weak_king)
+        quiet = ok & (push < 56)
+        add(index[quiet], (strong_king[quiet] << 12) | (weak_king[quiet] << 6) | push[quiet])
+        double = quiet & (square < 16) & (push + 8 != strong_king) & (push + 8 != weak_king)
+        add(index[double], (strong_king[double] << 12) | (weak_king[double] << 6) | (push[double] + 8))
+        promoting = ok & (push >= 56)
+        sources = index[promoting]
+        promoted = (strong_king[promoting] << 12) | (weak_king[promoting] << 6) | push[promoting]
+        for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+            if promotion in promotions:
+                values = promotions[promotion][1].reshape(-1)[promoted].astype(np.int16)
+                add(sources, extra_offset + np.arange(len(sources)))
+                extra_values.append(values)
+                extra_offset += len(sources)
+            else:
+                add(sources, np.full(len(sources), count))
+    else:
+        for target in range(64):
+            ok = (
+                legal_strong
+                & (target != strong_king)
+                & (target != weak_king)
+                & aligned[square, target]
+                & ~between[square, target, strong_king]
+                & ~between[square, target, weak_king]
+            )
+            add(index[ok], (strong_king[ok] << 12) | (weak_king[ok] << 6) | target)
+
+    strong_sources = np.concatenate(strong_sources)
+    strong_targets = np.concatenate(strong_targets)
+
+    weak_sources, weak_targets = [], []
+    for direction in range(8):
+        to = _KING_STEPS[weak_king, direction]
+        ok = legal_weak & (to >= 0)
+        to = np.where(ok, to, 0)
+        ok &= ~_NEAR[to, strong_king]
+        # taking the piece leaves two bare kings
+        captures = ok & (to == square)
+        weak_sources.append(index[captures])
+        weak_targets.append(np.full(captures.sum(), count))
+        ok &= (to != square) & ~attacked(to, strong_king)
+        weak_sources.append(index[ok])
+        weak_targets.append((strong_king[ok] << 12) | (to[ok] << 6) | square[ok])
+    weak_sources = np.concatenate(weak_sources)
+    weak_targets = np.concatenate(weak_targets)
+    weak_moves = np.bincount(weak_sources, minlength=count)
+
+    # values as signed plies + 1 like the stored ones, int16 while solving
+    strong = np.zeros(count + 1, dtype=np.int16)
+    weak = np.concatenate([np.zeros(count, dtype=np.int16)] + extra_values)
+    weak[:count][legal_weak & weak_in_check & (weak_moves == 0)] = -1
+
+    longest_extra = max(int(np.abs(values).max(initial=0)) for values in extra_values)
+    ply = 1
+    last_change = 0
+    while ply <= max(last_change, longest_extra) + 2:
+        if ply % 2:
+            # the strong side wins in ply plies by reaching a loss in ply - 1
+            wins = strong_sources[weak[strong_targets] == -ply]
+            wins = wins[strong[wins] == 0]
+            strong[wins] = ply + 1
+            changed = len(wins)
+        else:
+            # the weak side loses in ply plies when all its moves reach wins for the other side
+            won = strong[weak_targets] > 0
+            won_moves = np.bincount(weak_sources[won], minlength=count)
+            losses = legal_weak & (weak_moves > 0) & (won_moves == weak_moves) & (weak[:count] == 0)
+            weak[:count][losses] = -(ply + 1)
+            changed = int(losses.sum())
+        if changed:
+            last_change = ply
+        ply += 1
+
+    table = np.stack([strong[:count], weak[:count]]).astype(np.int8)
+    table[0][~legal_strong] = ILLEGAL
+    table[1][~legal_weak] = ILLEGAL
+    return table.reshape(TABLE_SHAPE)
+
+
+def generate(directory: str) -> list[str]:
+    """generates every table into directory; returns the paths written."""
+    os.makedirs(directory, exist_ok=True)
+    tables: dict[int, np.ndarray] = {}
+    paths = []
+    for name, piece in TABLE_PIECES.items():
+        start = time.perf_counter()
+        tables[piece] = generate_table(piece, tables)
+        path = os.path.join(directory, name + ".npy")
+        np.save(path, tables[piece])
+        paths.append(path)
+        logging.info(f"generated {path} in {time.perf_counter() - start:.1f}s")
+    return paths
+
+
+class Tablebases:
+    def __init__(self, directory: str):
+        """
+        memory-maps the tables found in directory; missing ones are just not probed.
+
+        Args:
+            directory (str): where generate() wrote them.
+        """
+        self.directory = directory
+        self.tables: dict[int, np.ndarray] = {}
+        for name, piece in TABLE_PIECES.items():
+            path = os.path.join(directory, name + ".npy")
+            if os.path.isfile(path):
+                self.tables[piece] = np.load(path, mmap_mode="r")
+        self.probes = 0
+        self.hits = 0
+
+    def __bool__(self):
+        return bool(self.tables)
+
+    def probe(self, position: Position) -> int | None:
+        """
+        the table value of position for its side to move (see the module docstring), None
+        when position isn't covered: other material, or castling rights left.
+        """
+        occupied = position.occupied_co[WHITE] | position.occupied_co[BLACK]
+        if occupied.bit_count() != 3 or position.castling:
+            return None
+        self.probes += 1
+        others = occupied & ~(1 << position.king_squares[WHITE]) & ~(1 << position.king_squares[BLACK])
+        square = others.bit_length() - 1
+        piece = position.squares[square]
+        table = self.tables.get(abs(piece))
+        if table is None:
+            return None
+        if piece > 0:
+            side = 0 if position.turn == WHITE else 1
+            value = table[side, position.king_squares[WHITE], position.king_squares[BLACK], square]
+        else:
+            # black's piece: flip the board so it plays up
+            side = 0 if position.turn == BLACK else 1
+            value = table[
+                side, position.king_squares[BLACK] ^ 56, position.king_squares[WHITE] ^ 56, square ^ 56
+            ]
+        if value == ILLEGAL:
+            return None
+        self.hits += 1
+        return int(value)
+
+    def _value_after(self, position: Position) -> int | None:
+        """probe() of a position reached from a covered one: bare kings and a lone minor piece are draws."""
+        occupied = position.occupied_co[WHITE] | position.occupied_co[BLACK]
+        if occupied.bit_count() == 2:
+            return DRAW
+        value = self.probe(position)
+        if value is None and any(
+            abs(piece) in (KNIGHT, BISHOP) for piece in position.squares
+        ):
+            return DRAW
+        return value
+
+    def best_move(self, position: Position) -> tuple[int, int] | None:
+        """
+        the fastest win, a draw, or the slowest loss for the side to move.
+
+        Returns:
+            tuple[int, int] | None: (move, value of position), None when position or one
+            of the positions after its moves isn't covered.
+        """
+        if self.probe(position) is None:
+            return None
+        best = None
+        for move in generate_legal_moves(position):
+            position.make_move(move)
+            value = self._value_after(position)
+            position.unmake_move()
+            if value is None:
+                return None
+            # the opponent's value -> ours, one ply further
+            if value < 0:
+                ours = -value + 1
+            elif value > 0:
+                ours = -(value + 1)
+            else:
+                ours = DRAW
+            # wins shortest first, then draws, then losses longest first
+            rank = (0, ours) if ours > 0 else (1, 0) if ours == 0 else (2, ours)
+            if best is None or rank < best[0]:
+                best = (rank, move, ours)
+        if best is None:
+            return None
+        return best[1], best[2]
+
+    def __repr__(self):
+        names = "".join(f" {PIECE_TABLES[piece]}" for piece in self.tables)
+        return f"Tablebases({self.directory!r}:{names})"
+
+
+def describe(value: int) -> str:
+    if value == DRAW:
+        return "draw"
+    if value > 0:
+        return f"win, mate in {value - 1} plies"
+    return f"loss, mated in {-value - 1} plies"
+
+
+def main(argv: list[str] | None = None) -> int:
+    # settings pulls in pygame, which the search processes importing this module don't need
+    import settings
+
+    parser = argparse.ArgumentParser(description="KQK, KRK and KPK tablebases")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate_command = commands.add_parser("generate", help="generate every table")
+    probe = commands.add_parser("probe", help="probe a position")
+    probe.add_argument("fen")
+    for command in (generate_command, probe):
+        command.add_argument("--dir", default=settings.TABLEBASE_DIR, help="defaults to settings.TABLEBASE_DIR")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        logging.basicConfig(level=logging.INFO)
+        generate(args.dir)
+        return 0
+    tablebases = Tablebases(args.dir)
+    position = Position.from_fen(args.fen)
+    value = tablebases.probe(position)
+    if value is None:
+        print("not in the tablebases")
+        return 1
+    print(describe(value))
+    best = tablebases.best_move(position)
+    if best is not None:
+        print(f"best move: {move_to_uci(best[0])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""Game clocks and search time budgets, on time.monotonic_ns().
+
+GameClock keeps both players' remaining time (base plus increment, optionally a number
+of moves per time period) for any game, bots or humans. TimeManager turns a clock reading
+into a budget for one search: a soft limit after which no new iteration is started and a
+hard limit at which the search is aborted, read only every check_interval nodes. a
+pondering search has no limits until ponderhit() hands it the budget of the real move.
+"""
+
+import time
+
+NS_PER_SECOND = 1_000_000_000
+# when no moves-to-go is known, the remaining time is spread over this many moves
+DEFAULT_MOVES_TO_GO = 30
+# kept in hand for the time between the search ending and the move reaching the board
+MOVE_OVERHEAD_NS = 50_000_000
+# a search may run past its soft limit up to this many times it, within the hard limit
+HARD_LIMIT_FACTOR = 4
+
+
+def seconds_to_ns(seconds: float) -> int:
+    return int(seconds * NS_PER_SECOND)
+
+
+class TimeManager:
+    def __init__(
+        self,
+        soft_limit_ns: int | None = None,
+        hard_limit_ns: int | None = None,
+        check_interval: int = 1024,
+    ):
+        """
+        limits are counted from start(); None means no limit.
+
+        Args:
+            soft_limit_ns (int, optional): don't start a new iteration after this long.
+            hard_limit_ns (int, optional): abort the search after this long.
+            check_interval (int, optional): nodes between two reads of the clock.
+            Defaults to 1024.
+        """
+        self.soft_limit_ns = soft_limit_ns
+        self.hard_limit_ns = hard_limit_ns
+        self.check_interval = check_interval
+        self.start_ns = time.monotonic_ns()
+        # searching on the opponent's time, waiting for ponderhit()
+        self.pondering = False
+
+    @classmethod
+    def fixed(cls, seconds: float | None, check_interval: int = 1024) -> "TimeManager":
+        """the same soft and hard limit: search until the time is up."""
+        limit = seconds_to_ns(seconds) if seconds is not None else None
+        return cls(limit, limit, check_interval)
+
+    @classmethod
+    def for_clock(
+        cls,
+        remaining_ns: int,
+        increment_ns: int = 0,
+        moves_to_go: int | None = None,
+        check_interval: int = 1024,
+    ) -> "TimeManager":
+        """
+        budgets one move out of a game clock: an even share of the remaining time over the
+        moves to go plus most of the increment, with a hard limit a few times that but
+        never more than half of what's left.
+
+        Args:
+            remaining_ns (int): time left on the mover's clock.
+            increment_ns (int, optional): added to the clock after every move. Defaults to 0.
+            moves_to_go (int, optional): moves until the next time control; unknown if None.
+        """
+        available = max(remaining_ns - MOVE_OVERHEAD_NS, 0)
+        moves = moves_to_go if moves_to_go else DEFAULT_MOVES_TO_GO
+        soft = available // moves + increment_ns * 3 // 4
+        hard = min(soft * HARD_LIMIT_FACTOR, available // 2 + increment_ns)
+        soft = min(soft, hard)
+        return cls(soft, hard, check_interval)
+
+    @classmethod
+    def ponder(cls, check_interval: int = 1024) -> "TimeManager":
+        """no limits until ponderhit()."""
+        time_manager = cls(None, None, check_interval)
+        time_manager.pondering = True
+        return time_manager
+
+    def ponderhit(self, soft_limit_ns: int | None, hard_limit_ns: int | None):
+        """the predicted move was played: the limits apply from now on."""
+        self.soft_limit_ns = soft_limit_ns
+        self.hard_limit_ns = hard_limit_ns
+        self.pondering = False
+        self.start()
+
+    def start(self):
+        self.start_ns = time.monotonic_ns()
+
+    def elapsed_ns(self) -> int:
+        return time.monotonic_ns() - self.start_ns
+
+    def soft_expired(self) -> bool:
+        """whether it's too late to start another iteration."""
+        return self.soft_limit_ns is not None and self.elapsed_ns() >= self.soft_limit_ns
+
+    def hard_expired(self) -> bool:
+        """whether the search must stop now."""
+        return self.hard_limit_ns is not None and self.elapsed_ns() >= self.hard_limit_ns
+
+    def __repr__(self):
+        return f"TimeManager(soft_limit_ns={self.soft_limit_ns}, hard_limit_ns={self.hard_limit_ns})"
+
+
+class GameClock:
+    def __init__(
+        self,
+        base_seconds: float,
+        increment_seconds: float = 0,
+        moves_per_period: int | None = None,
+    ):
+        """
+        a chess clock for two players, indexed by position.WHITE / BLACK.
+
+        Args:
+            base_seconds (float): starting time of each player.
+            increment_seconds (float, optional): added after each of a player's moves.
+            Defaults to 0.
+            moves_per_period (int, optional): base_seconds is added again every this many
+            moves of a player (classical controls like 40 moves in 90 minutes); None for a
+            single period.
+        """
+        self.base_ns = seconds_to_ns(base_seconds)
+        self.increment_ns = seconds_to_ns(increment_seconds)
+        self.moves_per_period = moves_per_period
+        self._remaining = [self.base_ns, self.base_ns]
+        self.moves_made = [0, 0]
+        # whose clock is running, None while stopped
+        self.running: int | None = None
+        self._started_ns = 0
+
+    def start(self, color: int):
+        """stops the running clock without increment and starts color's clock."""
+        self.stop()
+        self.running = color
+        self._started_ns = time.monotonic_ns()
+
+    def stop(self):
+        if self.running is None:
+            return
+        self._remaining[self.running] -= time.monotonic_ns() - self._started_ns
+        self.running = None
+
+    def press(self, color: int):
+        """color finished a move: its clock stops and gets the increment, the other starts."""
+        if self.running == color:
+            self.stop()
+        self.moves_made[color] += 1
+        self._remaining[color] += self.increment_ns
+        if self.moves_per_period and self.moves_made[color] % self.moves_per_period == 0:
+            self._remaining[color] += self.base_ns
+        self.start(color ^ 1)
+
+    def remaining_ns(self, color: int) -> int:
+        remaining = self._remaining[color]
+        if self.running == color:
+            remaining -= time.monotonic_ns() - self._started_ns
+        return remaining
+
+    def moves_to_go(self, color: int) -> int | None:
+        if not self.moves_per_period:
+            return None
+        return self.moves_per_period - self.moves_made[color] % self.moves_per_period
+
+    def flagged(self, color: int) -> bool:
+        """whether color ran out of time."""
+        return self.remaining_ns(color) <= 0
+
+    def time_manager(self, color: int) -> TimeManager:
+        """a search budget for color's next move."""
+        return TimeManager.for_clock(
+            self.remaining_ns(color), self.increment_ns, self.moves_to_go(color)
+        )
+
+    def format(self, color: int) -> str:
+        """remaining time as m:ss (tenths under ten seconds)."""
+        remaining = max(self.remaining_ns(color), 0)
+        if remaining < 10 * NS_PER_SECOND:
+            return f"0:{remaining / NS_PER_SECOND:04.1f}"
+        seconds = remaining // NS_PER_SECOND
+        return f"{seconds // 60}:{seconds % 60:02d}"
@@ -0,0 +1,167 @@
+"""Fixed-size transposition table for engine.Engine.
+
+the table is one preallocated NumPy array of buckets, each bucket holding two entries:
+slot 0 keeps the deepest result (depth-preferred), slot 1 takes whatever was stored last
+(always-replace). an entry is two 64-bit words, `data` (move, score, depth, bound and
+generation packed together) and `check` (the position key xor-ed with data), so a probe
+only trusts an entry whose words agree. that makes torn writes harmless and lets the
+array live in a shared memory buffer written by several processes without locks.
+"""
+
+import numpy as np
+
+# bound types
+EXACT = 1
+LOWER = 2  # score is at least this (fail high)
+UPPER = 3  # score is at most this (fail low)
+
+ENTRY_DTYPE = np.dtype([("check", "<u8"), ("data", "<u8")])
+SLOTS = 2
+BUCKET_BYTES = SLOTS * ENTRY_DTYPE.itemsize
+
+# data word layout: move 16 bits | score 32 bits | depth 8 bits | bound 2 bits | generation 6 bits
+SCORE_SHIFT = 16
+SCORE_OFFSET = 1 << 31
+DEPTH_SHIFT = 48
+BOUND_SHIFT = 56
+GENERATION_SHIFT = 58
+GENERATION_MASK = 0x3F
+MAX_DEPTH = 0xFF
+# a result for the position already in the depth-preferred slot replaces it only when
+# it's exact or at most this much shallower; other bounds go to the always-replace slot
+SAME_POSITION_DEPTH_MARGIN = 2
+
+
+def bucket_count(size_mb: float) -> int:
+    """the largest power of two number of buckets that fits in size_mb megabytes."""
+    buckets = max(1, int(size_mb * 1024 * 1024) // BUCKET_BYTES)
+    return 1 << (buckets.bit_length() - 1)
+
+
+def table_nbytes(size_mb: float) -> int:
+    """bytes a table of size_mb needs; the size of the buffer to pass to TranspositionTable."""
+    return bucket_count(size_mb) * BUCKET_BYTES
+
+
+class TranspositionTable:
+    def __init__(self, size_mb: float = 16, buffer=None):
+        """
+        Args:
+            size_mb (float, optional): memory for the table; rounded down to a power of two
+            number of buckets. Defaults to 16.
+            buffer (optional): an existing buffer of at least table_nbytes(size_mb) bytes to
+            keep the entries in (a multiprocessing.shared_memory.SharedMemory.buf for
+            example); its contents are used as they are. a new zeroed array is allocated if
+            it's None.
+        """
+        self.buckets = bucket_count(size_mb)
+        self._mask = self.buckets - 1
+        if buffer is None:
+            self.table = np.zeros(self.buckets * SLOTS, dtype=ENTRY_DTYPE)
+        else:
+            self.table = np.ndarray((self.buckets * SLOTS,), dtype=ENTRY_DTYPE, buffer=buffer)
+        # plain uint64 views; indexing them is much cheaper than indexing the records
+        self._checks = self.table["check"]
+        self._data = self.table["data"]
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    @property
+    def size_mb(self) -> float:
+        return self.table.nbytes / (1024 * 1024)
+
+    @property
+    def hit_rate(self) -> float:
+        """share of probes that found their position, since the last reset_stats()."""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def fill_ratio(self) -> float:
+        """share of the entries that are in use."""
+        return np.count_nonzero(self._data) / len(self._data)
+
+    def reset_stats(self):
+        self.probes = self.hits = self.stores = 0
+
+    def new_search(self):
+        """
+        starts a new generation; entries from older searches are replaced before
+        deeper ones from the current search.
+        """
+        self.generation = (self.generation + 1) & GENERATION_MASK
+
+    def clear(self):
+        self.table.fill(0)
+        self.generation = 0
+        self.reset_stats()
+
+    def probe(self, key: int) -> tuple[int, int, int, int] | None:
+        """
+        Args:
+            key (int): the position's Zobrist key (Position.key).
+
+        Returns:
+            tuple[int, int, int, int] | None: (move, score, depth, bound) of the stored
+            entry, None on a miss. move is 0 if the entry has none.
+        """
+        self.probes += 1
+        index = (key & self._mask) * SLOTS
+        for slot in range(index, index + SLOTS):
+            data = int(self._data[slot])
+            if data and int(self._checks[slot]) ^ data == key:
+                self.hits += 1
+                return (
+                    data & 0xFFFF,
+                    (data >> SCORE_SHIFT & 0xFFFFFFFF) - SCORE_OFFSET,
+                    data >> DEPTH_SHIFT & 0xFF,
+                    data >> BOUND_SHIFT & 0x3,
+                )
+        return None
+
+    def store(self, key: int, move: int, score: int, depth: int, bound: int):
+        """
+        Args:
+            key (int): the position's Zobrist key.
+            move (int): best move found, 0 if none.
+            score (int): the search score, with mate scores relative to this position.
+            depth (int): remaining depth the score was searched to.
+            bound (int): EXACT, LOWER or UPPER.
+        """
+        self.stores += 1
+        depth = min(max(depth, 0), MAX_DEPTH)
+        index = (key & self._mask) * SLOTS
+        data_array = self._data
+        old = int(data_array[index])
+        old_depth = old >> DEPTH_SHIFT & 0xFF
+        same_position = old and int(self._checks[index]) ^ old == key
+        if same_position and not move:
+            # keep the move of the same position when this result has none
+            move = old & 0xFFFF
+        data = (
+            move
+            | (score + SCORE_OFFSET) << SCORE_SHIFT
+            | depth << DEPTH_SHIFT
+            | bound << BOUND_SHIFT
+            | self.generation << GENERATION_SHIFT
+        )
+        if same_position:
+            replace = (
+                bound == EXACT
+                or depth >= old_depth - SAME_POSITION_DEPTH_MARGIN
+                or (old >> GENERATION_SHIFT) != self.generation
+            )
+        else:
+            replace = not old or depth >= old_depth or (old >> GENERATION_SHIFT) != self.generation
+        if replace:
+            slot = index
+        else:
+            slot = index + 1
+        data_array[slot] = data
+        self._checks[slot] = key ^ data
+
+    def __repr__(self):
+        return (
+            f"TranspositionTable(size_mb={self.size_mb:g}, hit_rate={self.hit_rate:.1%}, "
+            f"fill_ratio={self.fill_ratio():.1%})"
+        )